@@ -4,11 +4,13 @@ from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from sqlalchemy.ext.asyncio import AsyncSession
 import models, schemas
-from database import get_db
+from database import get_db, get_async_db
+from services.ttl_cache import TTLCache
+from services.google_certs import CachedCertsVerifier
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,6 +21,31 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60 # 30 days
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Authenticated users keyed by token subject, so most requests skip the users table
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+user_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+_CHANGED_USERS_KEY = "changed_user_ids"
+
+def _collect_changed_users(session, flush_context):
+    changed = session.info.setdefault(_CHANGED_USERS_KEY, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, models.User):
+            changed.add(obj.id)
+
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop(_CHANGED_USERS_KEY, ()):
+        user_cache.invalidate(user_id)
+
+def _discard_changed_users(session):
+    session.info.pop(_CHANGED_USERS_KEY, None)
+
+# Drop cached users once a change to their row is committed
+event.listen(Session, "after_flush", _collect_changed_users)
+event.listen(Session, "after_commit", _invalidate_changed_users)
+event.listen(Session, "after_rollback", _discard_changed_users)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -29,31 +56,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
         token_data = schemas.TokenData(user_id=user_id)
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(models.User).filter(models.User.id == token_data.user_id).first()
+        raise _credentials_exception()
+    return token_data.user_id
+
+def _cache_user(db_user):
+    # Cache a detached snapshot so it can be shared safely across requests
+    user = schemas.User.model_validate(db_user)
+    user_cache.set(user.id, user)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user_id = _token_subject(token)
+    user = user_cache.get(user_id)
     if user is None:
-        raise credentials_exception
+        db_user = db.query(models.User).filter(models.User.id == user_id).first()
+        if db_user is None:
+            raise _credentials_exception()
+        user = _cache_user(db_user)
     return user
 
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Same as get_current_user, but loads uncached users without blocking the event loop."""
+    user_id = _token_subject(token)
+    user = user_cache.get(user_id)
+    if user is None:
+        db_user = await db.get(models.User, user_id)
+        if db_user is None:
+            raise _credentials_exception()
+        user = _cache_user(db_user)
+    return user
+
+google_verifier = CachedCertsVerifier()
+
 def verify_google_token(token: str):
     try:
-        # Verify the token using Google's public keys
+        # Verify the token using Google's public keys, cached between logins
         # Note: In production, you should verify the 'aud' (audience) claim matches your Client ID
-        id_info = id_token.verify_oauth2_token(token, requests.Request())
+        id_info = google_verifier.verify(token)
         
         if id_info['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
             raise ValueError('Wrong issuer.')
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Benchmark model-response parsing over the saved response corpus.
+
+Compares the old json.loads-plus-fence-stripping parser with
+extract_json_object (backed by orjson when installed, or the stdlib with
+--stdlib). It reports the recovery rate and the mean time per response.
+
+    python benchmarks/bench_json_extract.py
+    python benchmarks/bench_json_extract.py --repeat 2000 --stdlib
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from services import json_extract
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "model_responses.jsonl")
+
+def load_corpus(path=CORPUS):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def legacy_parse(text):
+    """The parser used before extract_json_object, kept here for comparison."""
+    try:
+        if not text:
+            return None
+        return json.loads(text)
+    except json.JSONDecodeError:
+        cleaned_text = text.strip()
+        if cleaned_text.startswith("```json"):
+            cleaned_text = cleaned_text[7:]
+        elif cleaned_text.startswith("```"):
+            cleaned_text = cleaned_text[3:]
+        if cleaned_text.endswith("```"):
+            cleaned_text = cleaned_text[:-3]
+        try:
+            return json.loads(cleaned_text)
+        except json.JSONDecodeError:
+            return None
+
+def recovered(case, result):
+    if not case["expect"]:
+        return result is None
+    return isinstance(result, dict) and result.get("title") == case["title"]
+
+def run(name, parse, cases, repeat):
+    correct = sum(recovered(c, parse(c["text"])) for c in cases)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for c in cases:
+            parse(c["text"])
+    per_call = (time.perf_counter() - started) / (repeat * len(cases))
+    print(f"{name:<28} {correct}/{len(cases)} correct   {per_call * 1e6:8.1f} µs/response")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=500)
+    parser.add_argument("--stdlib", action="store_true", help="parse with json instead of orjson")
+    args = parser.parse_args()
+
+    if args.stdlib:
+        json_extract.loads = json.loads
+    backend = "json" if args.stdlib or json_extract.orjson is None else "orjson"
+    cases = load_corpus()
+    print(f"{len(cases)} responses, {args.repeat} passes, extractor backend: {backend}")
+    run("legacy json.loads + fences", legacy_parse, cases, args.repeat)
+    run("extract_json_object", json_extract.extract_json_object, cases, args.repeat)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Measure what the Prometheus instrumentation costs on /feed.
+
+The cost is measured two ways:
+
+- End to end: one process serves sequential /feed requests in-process
+  through httpx's ASGI transport, in alternating blocks. Blocks go either
+  to the bare app with the query hooks removed, or to the app wrapped in
+  MetricsMiddleware with the hooks installed. Interleaving the blocks keeps
+  drift (page cache, deck growth, other load) out of the comparison.
+- Direct: the middleware and the query hooks are also timed in isolation,
+  and their cost per /feed is the middleware plus the hooks times the
+  queries a /feed makes.
+
+    python benchmarks/bench_metrics.py
+    python benchmarks/bench_metrics.py --blocks 200 --block-size 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+def set_hooks(enabled: bool):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from services.metrics import instrument_queries, _before_cursor_execute, _after_cursor_execute
+    if enabled:
+        instrument_queries()
+    elif event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+def query_count() -> float:
+    from services.metrics import DB_QUERY_LATENCY
+    return sum(s.value for m in DB_QUERY_LATENCY.collect() for s in m.samples if s.name.endswith("_count"))
+
+def end_to_end(users: int, blocks: int, block_size: int, warmup: int) -> dict:
+    """Return {"on": [seconds], "off": [seconds], "queries_per_request": n} for /feed."""
+    import httpx
+    import main
+    from auth import create_access_token
+    from services.metrics import MetricsMiddleware
+
+    # A real server runs the refill trigger after the response is sent, but the
+    # ASGI transport waits for background tasks, so leave it out of the timing
+    main.buffer_refill.trigger = lambda: None
+    headers = [
+        {"Authorization": f"Bearer {create_access_token({'sub': f'bench-user-{u:06d}'})}"}
+        for u in range(users)
+    ]
+    apps = {"off": main.app, "on": MetricsMiddleware(main.app)}
+
+    async def run():
+        clients = {
+            name: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+            for name, app in apps.items()
+        }
+        samples = {"on": [], "off": []}
+        request = 0
+        for block in range(warmup + blocks):
+            # Alternate which configuration goes first in each pair of blocks
+            for name in (("on", "off") if block % 2 == 0 else ("off", "on")):
+                set_hooks(name == "on")
+                client = clients[name]
+                for _ in range(block_size):
+                    started = time.perf_counter()
+                    response = await client.get("/feed", headers=headers[request % users])
+                    elapsed = time.perf_counter() - started
+                    request += 1
+                    if response.status_code != 200:
+                        raise SystemExit(f"/feed returned {response.status_code}")
+                    if block >= warmup:
+                        samples[name].append(elapsed)
+        for client in clients.values():
+            await client.aclose()
+        return samples
+
+    queries_before = query_count()
+    samples = asyncio.run(run())
+    samples["queries_per_request"] = (query_count() - queries_before) / ((warmup + blocks) * block_size)
+    set_hooks(False)
+    return samples
+
+def hook_cost(n: int = 200_000) -> float:
+    """Seconds the two query hooks add to one statement."""
+    from services.metrics import _before_cursor_execute, _after_cursor_execute
+    context = SimpleNamespace()
+    statement = "SELECT articles.id FROM articles WHERE articles.user_id = ?"
+    started = time.perf_counter()
+    for _ in range(n):
+        _before_cursor_execute(None, None, statement, (), context, False)
+        _after_cursor_execute(None, None, statement, (), context, False)
+    return (time.perf_counter() - started) / n
+
+def middleware_cost(n: int = 100_000) -> float:
+    """Seconds MetricsMiddleware adds to one request, over calling the app directly."""
+    from services.metrics import MetricsMiddleware
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/feed", "route": SimpleNamespace(path="/feed")}
+    wrapped = MetricsMiddleware(app)
+
+    async def timed(target):
+        started = time.perf_counter()
+        for _ in range(n):
+            await target(scope, None, send)
+        return time.perf_counter() - started
+
+    async def run():
+        return await timed(wrapped) - await timed(app)
+
+    return asyncio.run(run()) / n
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=100, help="Timed blocks per configuration")
+    parser.add_argument("--block-size", type=int, default=50, help="Requests per block")
+    parser.add_argument("--warmup", type=int, default=4, help="Untimed blocks per configuration")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--scale", type=float, default=0.001, help="Seeded data scale (see seed_data.py)")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="crawler-bench-metrics-"), "bench.db")
+    # database reads these at import time; the middleware and hooks are toggled here instead
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["METRICS_ENABLED"] = "0"
+    import seed_data
+    seed_data.seed(os.environ["DATABASE_URL"], args.scale, log=lambda message: None)
+    users = min(args.users, seed_data.scale_counts(args.scale)["users"])
+
+    result = end_to_end(users, args.blocks, args.block_size, args.warmup)
+    on, off = statistics.median(result["on"]), statistics.median(result["off"])
+    per_query, per_request = hook_cost(), middleware_cost()
+    queries = result["queries_per_request"]
+    direct = per_request + per_query * queries
+
+    print(f"/feed, {len(result['on'])} requests per configuration in interleaved blocks of {args.block_size}")
+    print(f"metrics off: median {off * 1e6:.0f} us")
+    print(f"metrics on:  median {on * 1e6:.0f} us ({(on / off - 1) * 100:+.2f}%)")
+    print(f"\nDirect cost: middleware {per_request * 1e6:.2f} us + {queries:.1f} queries x {per_query * 1e6:.2f} us")
+    print(f"           = {direct * 1e6:.1f} us per /feed, {direct / off * 100:.2f}% of its latency")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark retention cleanup: row-by-row ORM deletes vs the set-based compactor.
+
+Seeds a throwaway SQLite database per size, with 90% of the articles consumed
+or archived, sets the word limit so that 10% of the words must go, and times
+one cleanup pass.
+
+    python benchmarks/bench_retention.py                  # 10k, 100k, 1M
+    python benchmarks/bench_retention.py --sizes 10000 --legacy-max 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+import models
+from services.word_ledger import reconcile_ledger, get_totals
+from services.retention import compact
+
+WORDS_PER_ARTICLE = 50
+CONTENT = " ".join(["word"] * WORDS_PER_ARTICLE)
+USERS = 100
+
+def seed(engine, size):
+    started = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": f"user-{u}", "email": f"user-{u}@example.com"} for u in range(USERS)
+        ])
+        chunk = 50000
+        for offset in range(0, size, chunk):
+            conn.execute(insert(models.ArticleCard.__table__), [
+                {
+                    "id": str(uuid.uuid4()),
+                    "user_id": f"user-{i % USERS}",
+                    "title": f"Article {i}",
+                    "summary": "Summary",
+                    "content": CONTENT,
+                    "citations": [],
+                    "is_consumed": i % 10 < 6,
+                    "is_archived": 6 <= i % 10 < 9,
+                    "is_read": False,
+                    "word_count": WORDS_PER_ARTICLE,
+                    "created_at": started + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + chunk, size))
+            ])
+
+def legacy_cleanup(db, word_limit):
+    """The pre-compactor cleanup loop, kept here for comparison."""
+    total_words = db.query(models.ArticleCard.word_count).filter(
+        models.ArticleCard.word_count.isnot(None)
+    ).all()
+    total_count = sum(wc[0] for wc in total_words if wc[0])
+    if total_count <= word_limit:
+        return 0
+    excess = total_count - word_limit
+    deleted_words = 0
+    for is_consumed_filter in [True, False]:
+        if deleted_words >= excess:
+            break
+        articles_to_delete = db.query(models.ArticleCard).filter(
+            models.ArticleCard.is_consumed == is_consumed_filter,
+            models.ArticleCard.is_archived == (not is_consumed_filter)
+        ).order_by(models.ArticleCard.id.asc()).all()
+        for article in articles_to_delete:
+            if deleted_words >= excess:
+                break
+            db.delete(article)
+            deleted_words += article.word_count or 0
+    db.commit()
+    return deleted_words
+
+def run(size, strategy):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        seed(engine, size)
+        db = sessionmaker(bind=engine, autoflush=False)()
+        try:
+            reconcile_ledger(db)
+            word_limit = int(size * WORDS_PER_ARTICLE * 0.9)
+            start = time.perf_counter()
+            if strategy == "legacy":
+                removed = legacy_cleanup(db, word_limit)
+            else:
+                removed = compact(db, word_limit=word_limit)
+            elapsed = time.perf_counter() - start
+            remaining = get_totals(db).total_words
+        finally:
+            db.close()
+            engine.dispose()
+    return elapsed, removed, remaining
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--legacy-max", type=int, default=100000,
+                        help="skip the legacy loop above this many articles (it loads every row)")
+    args = parser.parse_args()
+
+    print(f"{'articles':>10} {'strategy':>10} {'seconds':>10} {'removed words':>14}")
+    for size in args.sizes:
+        strategies = ["compactor"] + (["legacy"] if size <= args.legacy_max else [])
+        for strategy in strategies:
+            elapsed, removed, _ = run(size, strategy)
+            print(f"{size:>10} {strategy:>10} {elapsed:>10.3f} {removed:>14}")
+
+if __name__ == "__main__":
+    main()
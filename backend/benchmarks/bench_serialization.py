@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Benchmark article list serialization: ORM objects + response models vs row tuples + orjson.
+
+For each size, fetches that many articles from an in-memory SQLite database
+and turns them into a JSON body two ways:
+
+- legacy: full ArticleCard ORM instances, model_validate per card, then the
+  FastAPI response-model path (validate from attributes, dump JSON);
+- fast: rows of RowSerializer columns, dumped to dicts and rendered by
+  FastJSONResponse.
+
+Both the feed card shape (with content) and the archive list shape are timed.
+
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --sizes 1 100 10000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+import models, schemas
+from services.archive import LIST_ITEM
+from services.feed import CARD
+from services.serialization import FastJSONResponse, orjson
+
+CONTENT = " ".join(["word"] * 500)
+
+def seed(engine, size):
+    started = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [{"id": "user", "email": "user@example.com"}])
+        conn.execute(insert(models.ArticleCard.__table__), [
+            {
+                "id": f"article-{i:06d}",
+                "user_id": "user",
+                "title": f"Article {i}",
+                "summary": "A two sentence summary of the article. It is short.",
+                "content": CONTENT,
+                "citations": ["https://example.com/a", "https://example.com/b"],
+                "is_archived": True,
+                "word_count": 500,
+                "created_at": started + timedelta(seconds=i),
+            }
+            for i in range(size)
+        ])
+
+def time_it(fn, repeat):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        body = fn()
+    return (time.perf_counter() - started) / repeat, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=0, help="passes per size (default: scaled to size)")
+    args = parser.parse_args()
+
+    # What FastAPI does with a response_model: validate from attributes, then dump JSON
+    batch_adapter = TypeAdapter(schemas.FeedBatch)
+    page_adapter = TypeAdapter(schemas.ArchivePage)
+    print(f"renderer: {'orjson' if orjson else 'json'}")
+    print(f"{'articles':>8}  {'shape':<8} {'legacy':>11} {'fast':>11} {'speedup':>8}")
+
+    for size in args.sizes:
+        engine = create_engine("sqlite://")
+        models.Base.metadata.create_all(engine)
+        seed(engine, size)
+        db = sessionmaker(bind=engine)()
+        repeat = args.repeat or max(3, 20000 // size)
+
+        def legacy_cards():
+            db.expunge_all()
+            articles = db.query(models.ArticleCard).all()
+            cards = [schemas.ArticleCard.model_validate(a) for a in articles]
+            content = batch_adapter.validate_python({"cards": cards, "cursor": "c"}, from_attributes=True)
+            return batch_adapter.dump_json(content)
+
+        def fast_cards():
+            cards = CARD.dump(db.execute(select(*CARD.columns)).all())
+            return FastJSONResponse({"cards": cards, "cursor": "c"}).body
+
+        def legacy_archive():
+            rows = db.execute(select(*LIST_ITEM.columns)).all()
+            content = page_adapter.validate_python({"items": rows, "next_cursor": None}, from_attributes=True)
+            return page_adapter.dump_json(content)
+
+        def fast_archive():
+            rows = db.execute(select(*LIST_ITEM.columns)).all()
+            return FastJSONResponse({"items": LIST_ITEM.dump(rows), "next_cursor": None}).body
+
+        for shape, legacy, fast in (("cards", legacy_cards, fast_cards), ("archive", legacy_archive, fast_archive)):
+            legacy_s, _ = time_it(legacy, repeat)
+            fast_s, _ = time_it(fast, repeat)
+            print(f"{size:>8}  {shape:<8} {legacy_s * 1000:>9.3f}ms {fast_s * 1000:>9.3f}ms {legacy_s / fast_s:>7.1f}x")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Benchmark feed throughput with and without the SQLite tuning profile while generation writes run.
+
+For each profile a throwaway database is seeded, one writer thread keeps
+saving articles the way the generation pipeline does, and several reader
+threads deal feed cards and list archive pages as fast as they can.
+
+    python benchmarks/bench_sqlite_profile.py --seconds 10 --readers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+import models
+from database import build_engine
+from services.feed import deal_articles, add_to_deck
+from services.archive import archive_page
+
+USERS = 50
+ARTICLES_PER_USER = 200
+CONTENT = " ".join(["word"] * 500)
+
+def seed(engine):
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [
+            {"id": f"user-{u}", "email": f"user-{u}@example.com"} for u in range(USERS)
+        ])
+        conn.execute(insert(models.ArticleCard.__table__), [
+            {
+                "id": str(uuid.uuid4()), "user_id": f"user-{i % USERS}", "title": f"Article {i}",
+                "summary": "Summary", "content": CONTENT, "citations": [], "is_consumed": False,
+                "is_archived": i % 3 == 0, "is_read": False, "word_count": 500, "rand_key": (i * 0.6180339887) % 1,
+            }
+            for i in range(USERS * ARTICLES_PER_USER)
+        ])
+
+def writer(Session, stop, counters):
+    i = 0
+    while not stop.is_set():
+        db = Session()
+        try:
+            article = models.ArticleCard(
+                id=str(uuid.uuid4()), user_id=f"user-{i % USERS}", title="New", summary="Summary",
+                content=CONTENT, citations=[], word_count=500
+            )
+            db.add(article)
+            add_to_deck(db, article)
+            db.commit()
+            counters["writes"] += 1
+        except OperationalError:
+            db.rollback()
+            counters["write_errors"] += 1
+        finally:
+            db.close()
+        i += 1
+        time.sleep(0.005)
+
+def reader(Session, stop, counters, index):
+    i = index
+    while not stop.is_set():
+        user_id = f"user-{i % USERS}"
+        db = Session()
+        try:
+            deal_articles(db, user_id, 1)
+            db.commit()
+            archive_page(db, user_id, limit=20)
+            counters["reads"] += 1
+        except OperationalError:
+            db.rollback()
+            counters["read_errors"] += 1
+        finally:
+            db.close()
+        i += 1
+
+def run(tuned, seconds, readers):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = build_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", tuned=tuned)
+        models.Base.metadata.create_all(bind=engine)
+        seed(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        counters = {"reads": 0, "read_errors": 0, "writes": 0, "write_errors": 0}
+        stop = threading.Event()
+        threads = [threading.Thread(target=writer, args=(Session, stop, counters))]
+        threads += [threading.Thread(target=reader, args=(Session, stop, counters, r)) for r in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        engine.dispose()
+    return counters
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{'profile':>8} {'feed ops/s':>11} {'read errors':>12} {'writes/s':>9} {'write errors':>13}")
+    for tuned in (False, True):
+        c = run(tuned, args.seconds, args.readers)
+        print(f"{'tuned' if tuned else 'default':>8} {c['reads'] / args.seconds:>11.1f} {c['read_errors']:>12} "
+              f"{c['writes'] / args.seconds:>9.1f} {c['write_errors']:>13}")
+
+if __name__ == "__main__":
+    main()
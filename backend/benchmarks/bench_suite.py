@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Time the backend's hot paths on a seeded database and compare against a JSON baseline.
+
+The database comes from seed_data.py. It is seeded once per scale and seed,
+and reused from the temp directory after that. Each run works on a fresh
+copy, because several paths delete or rewrite rows. Timed paths:
+
+- feed_pop_cold: first /feed pop for a user, which builds the deck;
+- feed_pop: later /feed pops (pop_next_article);
+- feed_batch: /feed/batch dealing 5 cards (deal_articles);
+- archive_first_page: /archive at the default page size;
+- archive_page_5: the fifth page, following cursors, at ``DEEP_PAGE_SIZE``;
+- refill_plan: one buffer refill plan, with the sampled users active;
+- migrate_word_counts: startup backfill of legacy rows without a word count;
+- reconcile_ledger: rebuilding the word count ledger from the articles;
+- cleanup_old_articles: one retention pass removing 1% of all words.
+
+Results go to stdout. If a baseline exists for the scale, every path is
+compared with it and a path more than --threshold times slower is reported
+as a regression. --save writes this run as the new baseline.
+
+    python benchmarks/bench_suite.py                       # scale 0.01: 1k users, 100k articles
+    python benchmarks/bench_suite.py --scale 0.1 --save
+    python benchmarks/bench_suite.py --scale 1 --check     # 10M articles; exits 1 on a regression
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+# Small pages, so that a typical seeded user's archive is five pages deep
+DEEP_PAGE_SIZE = 4
+
+def percentile(sorted_values, pct: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(samples: list) -> dict:
+    values = sorted(samples)
+    return {
+        "n": len(values),
+        "mean_ms": sum(values) / len(values) * 1000,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+    }
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_suite(user_ids: list, feed_pops: int) -> dict:
+    # Imported only now: database reads DATABASE_URL at import time
+    import main
+    from database import SessionLocal
+    from services.archive import archive_page
+    from services.feed import pop_next_article, deal_articles
+    from services.refill_scheduler import plan_refill, record_activity
+    from services.retention import compact
+    from services.word_ledger import get_totals, reconcile_ledger
+
+    results = {}
+    db = SessionLocal()
+    try:
+        first, deep = [], []
+        for user_id in user_ids:
+            first.append(timed(archive_page, db, user_id)[0])
+            rows, cursor = archive_page(db, user_id, limit=DEEP_PAGE_SIZE)
+            for _ in range(4):
+                if not cursor:
+                    break
+                elapsed, (rows, cursor) = timed(archive_page, db, user_id, limit=DEEP_PAGE_SIZE, cursor=cursor)
+            else:
+                deep.append(elapsed)
+        results["archive_first_page"] = summarize(first)
+        if deep:
+            results["archive_page_5"] = summarize(deep)
+
+        cold, warm, batch = [], [], []
+        for user_id in user_ids:
+            elapsed, _ = timed(lambda: (pop_next_article(db, user_id), db.commit()))
+            cold.append(elapsed)
+            for _ in range(feed_pops):
+                elapsed, _ = timed(lambda: (pop_next_article(db, user_id), db.commit()))
+                warm.append(elapsed)
+            elapsed, _ = timed(lambda: (deal_articles(db, user_id, 5), db.commit()))
+            batch.append(elapsed)
+        results["feed_pop_cold"] = summarize(cold)
+        results["feed_pop"] = summarize(warm)
+        results["feed_batch"] = summarize(batch)
+
+        now = time.time()
+        for user_id in user_ids:
+            record_activity(user_id, now)
+        results["refill_plan"] = summarize([timed(plan_refill, db, now)[0] for _ in range(5)])
+        db.rollback()
+    finally:
+        db.close()
+
+    results["migrate_word_counts"] = summarize([timed(main.migrate_word_counts)[0]])
+
+    db = SessionLocal()
+    try:
+        results["reconcile_ledger"] = summarize([timed(reconcile_ledger, db)[0]])
+        total = get_totals(db).total_words
+        results["cleanup_old_articles"] = summarize([timed(compact, db, word_limit=int(total * 0.99))[0]])
+    finally:
+        db.close()
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print each path against the baseline; return the names of regressed paths."""
+    regressions = []
+    print(f"\nAgainst baseline {baseline['revision']} ({baseline['created_at']}), threshold {threshold:.2f}x")
+    print(f"{'path':<22} {'baseline p50':>13} {'now p50':>10} {'ratio':>7}")
+    for name, now in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<22} {'-':>13} {now['p50_ms']:>10.2f} {'new':>7}")
+            continue
+        ratio = now["p50_ms"] / before["p50_ms"] if before["p50_ms"] else float("inf")
+        flag = "  REGRESSION" if ratio > threshold else ""
+        print(f"{name:<22} {before['p50_ms']:>13.2f} {now['p50_ms']:>10.2f} {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=0.01, help="1.0 = 100k users, 1M topics, 10M articles")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="Seeded database to reuse (created if missing)")
+    parser.add_argument("--users", type=int, default=200, help="Users sampled for the per-request paths")
+    parser.add_argument("--feed-pops", type=int, default=5, help="Warm /feed pops per sampled user")
+    parser.add_argument("--baseline", help="Baseline file (default: baselines/scale-<scale>.json)")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--save", action="store_true", help="Write this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any path regressed")
+    args = parser.parse_args()
+
+    seeded = args.db or os.path.join(tempfile.gettempdir(), f"crawler-bench-scale{args.scale:g}-seed{args.seed}.db")
+    workdir = tempfile.mkdtemp(prefix="crawler-bench-")
+    work = os.path.join(workdir, "work.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{work}"
+
+    import seed_data
+    counts = seed_data.scale_counts(args.scale)
+    if not os.path.exists(seeded):
+        print(f"Seeding {seeded}")
+        seed_data.seed(f"sqlite:///{seeded}", args.scale, args.seed)
+    shutil.copyfile(seeded, work)
+
+    step = max(1, counts["users"] // args.users)
+    user_ids = [f"bench-user-{u:06d}" for u in range(0, counts["users"], step)][:args.users]
+    print(f"Timing hot paths on {counts['articles']} articles, {len(user_ids)} sampled users")
+    try:
+        results = run_suite(user_ids, args.feed_pops)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'path':<22} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<22} {r['n']:>5} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+
+    run = {
+        "revision": git_revision(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "scale": args.scale,
+        "seed": args.seed,
+        "counts": counts,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "results": results,
+    }
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"scale-{args.scale:g}.json")
+    regressions = []
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+    if args.save:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump(run, f, indent=2)
+            f.write("\n")
+        print(f"\nSaved baseline {baseline_path}")
+    if regressions and args.check:
+        print(f"\n{len(regressions)} paths regressed: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
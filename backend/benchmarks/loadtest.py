@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""End-to-end load test: many concurrent signed-in users against a running API.
+
+By default this starts its own server on a free port. The server gets a
+fresh SQLite database seeded with users, topics and articles, and runs with
+LLM_BACKEND=synthetic, so /generate costs no Gemini quota. Each simulated user
+loops over a weighted mix of requests:
+
+- feed: GET /feed;
+- swipe: POST /articles/{id}/swipe on the last card the user was dealt;
+- archive: GET /archive;
+- generate: POST /generate/{topic_id}, whose jobs are checked at the end.
+
+The report gives count, errors, throughput and p50/p95/p99 latency per
+operation.
+
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --users 200 --duration 60 --mix feed=60,swipe=30,archive=10
+    python benchmarks/loadtest.py --synthetic-latency fixed:0.2 --synthetic-error-rate 0.05 --json loadtest.json
+
+To target a server that is already running, pass --base-url together with the
+--database-url it uses. Run with the same SECRET_KEY so the tokens minted here
+are accepted.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+DEFAULT_MIX = "feed=50,swipe=25,archive=20,generate=5"
+TOPICS = ["AI chips", "Climate policy", "Space launches", "Battery research", "Open source", "Elections", "Markets"]
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("feed", "swipe", "archive", "generate"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def seed(users: int, topics_per_user: int, articles_per_user: int, seed_value: int):
+    """Insert users, topics and unread articles; return [(user_id, [topic_id])]."""
+    from sqlalchemy import insert
+    import models
+    from database import engine
+    from migrations import run_migrations
+    from services.topics import canonical_key
+
+    models.Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    user_rows, topic_rows, article_rows, accounts = [], [], [], []
+    for u in range(users):
+        user_id = f"loadtest-{u}"
+        user_rows.append({"id": user_id, "email": f"{user_id}@example.com", "name": f"Load test {u}"})
+        topic_ids = []
+        for query in rng.sample(TOPICS, min(topics_per_user, len(TOPICS))):
+            topic_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            topic_rows.append({"id": topic_id, "user_id": user_id, "query": query, "canonical_key": canonical_key(query)})
+            topic_ids.append(topic_id)
+        for a in range(articles_per_user):
+            words = rng.randint(200, 800)
+            article_rows.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "user_id": user_id,
+                "topic_id": rng.choice(topic_ids),
+                "title": f"Seeded article {a} for {user_id}",
+                "summary": "Seeded for load testing.",
+                "content": " ".join(["word"] * words),
+                "citations": [],
+                "is_archived": rng.random() < 0.2,
+                "is_read": False,
+                "is_consumed": False,
+                "word_count": words,
+                "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 7)),
+                "rand_key": rng.random(),
+            })
+        accounts.append((user_id, topic_ids))
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), user_rows)
+        conn.execute(insert(models.Topic.__table__), topic_rows)
+        for i in range(0, len(article_rows), 5000):
+            conn.execute(insert(models.ArticleCard.__table__), article_rows[i:i + 5000])
+    engine.dispose()
+    return accounts
+
+def start_server(port: int, env: dict, log_path: str):
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+def wait_until_up(base_url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"Server at {base_url} did not come up within {timeout:.0f}s")
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.status = {}
+
+    def add(self, op: str, seconds: float, status: int):
+        if status >= 400 or status == 0:
+            self.errors[op] = self.errors.get(op, 0) + 1
+            self.status.setdefault(op, {}).setdefault(status, 0)
+            self.status[op][status] += 1
+        else:
+            self.latencies.setdefault(op, []).append(seconds)
+
+    def report(self, elapsed: float) -> dict:
+        ops = {}
+        for op in sorted(set(self.latencies) | set(self.errors)):
+            values = sorted(self.latencies.get(op, []))
+            ops[op] = {
+                "ok": len(values),
+                "errors": self.errors.get(op, 0),
+                "error_status": {str(k): v for k, v in self.status.get(op, {}).items()},
+                "rps": len(values) / elapsed,
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+        total = sum(o["ok"] for o in ops.values())
+        return {"elapsed_s": elapsed, "requests": total, "rps": total / elapsed, "operations": ops}
+
+async def timed(client, recorder, op: str, method: str, url: str, headers: dict):
+    """Send one request and record its latency; return the response, or None on failure."""
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, headers=headers)
+        status = response.status_code
+    except httpx.HTTPError:
+        response, status = None, 0
+    recorder.add(op, time.perf_counter() - started, status)
+    return response if 0 < status < 400 else None
+
+async def user_loop(client, recorder, token: str, topic_ids: list, mix: dict, stop_at: float, think: float, rng, jobs: list):
+    headers = {"Authorization": f"Bearer {token}"}
+    names, weights = list(mix), list(mix.values())
+    last_card = None
+    while time.monotonic() < stop_at:
+        op = rng.choices(names, weights)[0]
+        if op == "swipe" and last_card is None:
+            # Nothing dealt yet, so fetch a card first
+            op = "feed"
+        if op == "feed":
+            response = await timed(client, recorder, op, "GET", "/feed", headers)
+            cards = response.json() if response is not None else []
+            if cards:
+                last_card = cards[0]["id"]
+        elif op == "swipe":
+            await timed(client, recorder, op, "POST", f"/articles/{last_card}/swipe", headers)
+            last_card = None
+        elif op == "archive":
+            await timed(client, recorder, op, "GET", "/archive?limit=20", headers)
+        elif op == "generate":
+            response = await timed(client, recorder, op, "POST", f"/generate/{rng.choice(topic_ids)}", headers)
+            if response is not None:
+                jobs.append((headers, response.json()["job_id"]))
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+async def job_states(client, jobs: list, wait: float) -> dict:
+    """Wait up to ``wait`` seconds for generation jobs to settle and count their states."""
+    deadline = time.monotonic() + wait
+    states = {}
+    while True:
+        states = {}
+        for headers, job_id in jobs:
+            try:
+                response = await client.get(f"/jobs/{job_id}", headers=headers)
+                state = response.json()["state"] if response.status_code == 200 else f"http_{response.status_code}"
+            except httpx.HTTPError:
+                state = "unreachable"
+            states[state] = states.get(state, 0) + 1
+        pending = states.get("queued", 0) + states.get("running", 0)
+        if not pending or time.monotonic() >= deadline:
+            return states
+        await asyncio.sleep(1)
+
+async def run_load(base_url: str, accounts: list, args) -> dict:
+    from auth import create_access_token
+
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    jobs = []
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        started = time.monotonic()
+        stop_at = started + args.duration
+        await asyncio.gather(*(
+            user_loop(
+                client, recorder,
+                create_access_token({"sub": user_id}, expires_delta=timedelta(hours=1)),
+                topic_ids, mix, stop_at, args.think, random.Random(args.seed + i), jobs,
+            )
+            for i, (user_id, topic_ids) in enumerate(accounts)
+        ))
+        elapsed = time.monotonic() - started
+        result = recorder.report(elapsed)
+        if jobs:
+            result["generation_jobs"] = await job_states(client, jobs, args.job_wait)
+    return result
+
+def print_report(result: dict):
+    print(f"{result['requests']} requests in {result['elapsed_s']:.1f}s ({result['rps']:.1f} req/s)")
+    print(f"{'operation':<10} {'ok':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for op, o in result["operations"].items():
+        print(f"{op:<10} {o['ok']:>8} {o['errors']:>7} {o['rps']:>8.1f} {o['p50_ms']:>9.1f} {o['p95_ms']:>9.1f} {o['p99_ms']:>9.1f}")
+        if o["error_status"]:
+            print(f"{'':<10} error statuses: {o['error_status']}")
+    if "generation_jobs" in result:
+        print(f"generation jobs: {result['generation_jobs']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Target a running server instead of starting one")
+    parser.add_argument("--database-url", help="Database to seed (required with --base-url)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--topics-per-user", type=int, default=3)
+    parser.add_argument("--articles-per-user", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operations, e.g. feed=50,swipe=25")
+    parser.add_argument("--think", type=float, default=0.0, help="Mean pause between a user's requests, in seconds")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--job-wait", type=float, default=10.0, help="Seconds to wait for generation jobs at the end")
+    parser.add_argument("--synthetic-latency", default="lognormal:1.0,0.5", help="SYNTHETIC_LATENCY for a started server")
+    parser.add_argument("--synthetic-error-rate", type=float, default=0.0, help="SYNTHETIC_SERVER_ERROR_RATE for a started server")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    if args.base_url and not args.database_url:
+        parser.error("--base-url needs the --database-url of that server, to seed its users")
+
+    workdir = tempfile.mkdtemp(prefix="crawler-loadtest-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    # database and auth read these at import time
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", uuid.uuid4().hex)
+
+    print(f"Seeding {args.users} users x {args.articles_per_user} articles into {database_url}")
+    accounts = seed(args.users, args.topics_per_user, args.articles_per_user, args.seed)
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        env = dict(
+            os.environ,
+            LLM_BACKEND="synthetic",
+            SYNTHETIC_LATENCY=args.synthetic_latency,
+            SYNTHETIC_SERVER_ERROR_RATE=str(args.synthetic_error_rate),
+            GEMINI_RPM="1000000",
+            GEMINI_TPM="1000000000",
+        )
+        log_path = os.path.join(workdir, "server.log")
+        print(f"Starting server on {base_url} (log: {log_path})")
+        server = start_server(port, env, log_path)
+    try:
+        wait_until_up(base_url)
+        print(f"Running {args.mix} for {args.duration:.0f}s")
+        result = asyncio.run(run_load(base_url, accounts, args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    result["config"] = {
+        "users": args.users, "articles_per_user": args.articles_per_user, "mix": args.mix,
+        "think_s": args.think, "synthetic_latency": None if args.base_url else args.synthetic_latency,
+    }
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
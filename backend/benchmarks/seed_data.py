@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic data for benchmarks.
+
+Full scale (``--scale 1``) is 100k users, 1M topics and 10M articles. Smaller
+scales shrink all three proportionally. The same scale and seed always give
+the same database: ids, timestamps, topic choices and article states are all
+drawn from one seeded generator, in a fixed order.
+
+The shape is modelled on production:
+
+- every user follows ``TOPICS_PER_USER`` topics;
+- topic queries come from a shared pool with a long-tailed popularity, so
+  popular canonical keys fan out to many subscribers;
+- a user's articles spread over the last ``HISTORY_DAYS`` days, and
+  ``UNREAD_SHARE``/``CONSUMED_SHARE``/``ARCHIVED_SHARE`` of them are in each
+  state;
+- ``LEGACY_SHARE`` of the articles have no word_count, like rows written
+  before the column existed.
+
+Article bodies are drawn from a small pool of ``content_words``-word texts.
+Even so, a full-scale SQLite file is about 17 GB and takes some 15 minutes
+to seed. Each row stores the MinHash of its body, so the startup backfill
+has nothing to do. Seeding finishes by rebuilding the word count ledger.
+
+    python benchmarks/seed_data.py /tmp/bench.db --scale 0.01
+    python benchmarks/seed_data.py /tmp/full.db --scale 1     # 10M articles
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+import models
+from migrations import run_migrations
+from services.dedup import minhash, pack
+from services.topics import canonical_key
+from services.word_ledger import reconcile_ledger
+
+FULL_USERS = 100_000
+TOPICS_PER_USER = 10
+ARTICLES_PER_USER = 100
+QUERY_POOL = 20_000
+BODY_POOL = 64
+HISTORY_DAYS = 30
+UNREAD_SHARE = 0.2
+CONSUMED_SHARE = 0.6
+ARCHIVED_SHARE = 0.2
+LEGACY_SHARE = 0.01
+CHUNK = 20_000
+EPOCH = datetime(2024, 6, 1)
+
+_VOCABULARY = (
+    "ai chips climate policy space launch battery research open source election market "
+    "energy grid security privacy court ruling vaccine trial satellite network startup "
+    "funding inflation rates trade tariff supply chain robotics quantum fusion ocean "
+    "drought wildfire housing transit football chess music film science health"
+).split()
+
+def scale_counts(scale: float) -> dict:
+    users = max(1, int(FULL_USERS * scale))
+    return {"users": users, "topics": users * TOPICS_PER_USER, "articles": users * ARTICLES_PER_USER}
+
+def _make_id(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def _sqlite_bulk_load_pragmas(dbapi_connection, connection_record):
+    # Seeding is a one-off bulk load into a throwaway file: skip durability
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=OFF")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA cache_size=-256000")
+    cursor.close()
+
+def seed(url: str, scale: float = 0.01, seed_value: int = 42, content_words: int = 60, log=print) -> dict:
+    """Create and fill a database at ``url``; return the row counts."""
+    counts = scale_counts(scale)
+    rng = random.Random(seed_value)
+    engine = create_engine(url)
+    if url.startswith("sqlite"):
+        event.listen(engine, "connect", _sqlite_bulk_load_pragmas)
+    models.Base.metadata.create_all(bind=engine)
+
+    queries = [" ".join(rng.sample(_VOCABULARY, 3)) for _ in range(QUERY_POOL)]
+    bodies = [" ".join(rng.choice(_VOCABULARY) for _ in range(content_words)) for _ in range(BODY_POOL)]
+    signatures = [pack(minhash(body)) for body in bodies]
+    history_seconds = HISTORY_DAYS * 24 * 3600
+    started = time.perf_counter()
+
+    user_rows, topic_rows, article_rows = [], [], []
+    n_articles = 0
+
+    def flush(conn, force=False):
+        if user_rows and (force or len(user_rows) >= CHUNK):
+            conn.execute(insert(models.User.__table__), user_rows)
+            user_rows.clear()
+        if topic_rows and (force or len(topic_rows) >= CHUNK):
+            conn.execute(insert(models.Topic.__table__), topic_rows)
+            topic_rows.clear()
+        if article_rows and (force or len(article_rows) >= CHUNK):
+            conn.execute(insert(models.ArticleCard.__table__), article_rows)
+            article_rows.clear()
+
+    with engine.begin() as conn:
+        for u in range(counts["users"]):
+            user_id = f"bench-user-{u:06d}"
+            user_rows.append({
+                "id": user_id, "email": f"{user_id}@example.com", "name": f"Bench user {u}",
+                "created_at": EPOCH - timedelta(days=HISTORY_DAYS),
+            })
+            topic_ids = []
+            for _ in range(TOPICS_PER_USER):
+                # Log-uniform index: a few queries are very popular, most are rare
+                query = queries[int(QUERY_POOL ** rng.random()) - 1]
+                topic_id = _make_id(rng)
+                topic_rows.append({"id": topic_id, "user_id": user_id, "query": query, "canonical_key": canonical_key(query)})
+                topic_ids.append(topic_id)
+            for _ in range(ARTICLES_PER_USER):
+                body = rng.randrange(BODY_POOL)
+                state = rng.random()
+                legacy = rng.random() < LEGACY_SHARE
+                article_rows.append({
+                    "id": _make_id(rng),
+                    "user_id": user_id,
+                    "topic_id": rng.choice(topic_ids),
+                    "title": f"Article {n_articles}",
+                    "summary": f"Summary of article {n_articles}.",
+                    "content": bodies[body],
+                    "citations": [],
+                    "is_read": False,
+                    "is_consumed": UNREAD_SHARE <= state < UNREAD_SHARE + CONSUMED_SHARE,
+                    "is_archived": state >= UNREAD_SHARE + CONSUMED_SHARE,
+                    "word_count": None if legacy else content_words,
+                    "created_at": EPOCH - timedelta(seconds=rng.randrange(history_seconds)),
+                    "rand_key": rng.random(),
+                    "minhash": signatures[body],
+                })
+                n_articles += 1
+            flush(conn)
+            if (u + 1) % max(1, counts["users"] // 10) == 0:
+                log(f"  seeded {u + 1}/{counts['users']} users, {n_articles} articles ({time.perf_counter() - started:.0f}s)")
+        flush(conn, force=True)
+
+    run_migrations(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        reconcile_ledger(db)
+    finally:
+        db.close()
+    engine.dispose()
+    log(f"Seeded {counts['users']} users, {counts['topics']} topics, {counts['articles']} articles in {time.perf_counter() - started:.1f}s")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="SQLite file to create")
+    parser.add_argument("--scale", type=float, default=0.01, help="1.0 = 100k users, 1M topics, 10M articles")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--content-words", type=int, default=60)
+    args = parser.parse_args()
+    if os.path.exists(args.path):
+        parser.error(f"{args.path} already exists")
+    seed(f"sqlite:///{args.path}", args.scale, args.seed, args.content_words)
+
+if __name__ == "__main__":
+    main()
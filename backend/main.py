@@ -1,18 +1,35 @@
-from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, Depends, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from sqlalchemy.sql import func
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import models, schemas
-from database import engine, get_db, SessionLocal
-from services.gemini_service import generate_article_content
+from database import engine, get_db, get_async_db, SessionLocal
+from services.gemini_service import generate_article_content, stream_article_content
+from services.job_queue import enqueue, jobs_available, start_worker
+from services.single_flight import SingleFlight
+from services.refill_scheduler import plan_refill, group_by_canonical_topic, record_activity
+from services.word_ledger import ensure_ledger
+from services.retention import compact, start_retention_loop
+from services.archive import archive_page, LIST_ITEM, DEFAULT_PAGE_SIZE
+from services.feed import pop_next_article, deal_articles, add_to_deck, remove_from_deck, encode_cursor, decode_cursor, CARD
+from services.serialization import FastJSONResponse
+from services.dedup import admit_article, article_index, pack, DuplicateArticleError
+from services.topics import canonical_key
+from services.topic_context import recent_digests, record_article
+from services.metrics import MetricsMiddleware, METRICS_ENABLED, instrument_queries, metrics_allowed, render_metrics, watch_cache, watch_single_flight, CLEANUP_LATENCY, CLEANUP_WORDS
+from migrations import run_migrations, backfill_minhashes
+import os
+import json
 import uuid
-import random
 from logging_config import logger, article_logger
-from auth import verify_google_token, create_access_token, get_current_user
+from auth import verify_google_token, create_access_token, get_current_user, get_current_user_async, user_cache
 from pydantic import BaseModel
 
 models.Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 def seed_default_topics():
     # Deprecated: Topics are now seeded per-user upon login
@@ -28,6 +45,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_queries()
+watch_cache("users", user_cache)
+
 class GoogleAuthRequest(BaseModel):
     token: str
 
@@ -61,7 +83,7 @@ async def google_auth(request: GoogleAuthRequest, db: Session = Depends(get_db))
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/auth/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(get_current_user)):
+async def read_users_me(current_user: models.User = Depends(get_current_user_async)):
     return current_user
 
 @app.post("/auth/refresh", response_model=schemas.Token)
@@ -71,47 +93,11 @@ async def refresh_token(current_user: models.User = Depends(get_current_user)):
 
 
 def cleanup_old_articles():
-    """Delete oldest consumed/archived articles when total word count exceeds 5000."""
+    """Delete oldest consumed/archived articles when total word count exceeds the limit."""
     db = SessionLocal()
     try:
-        # Calculate total word count
-        total_words = db.query(models.ArticleCard.word_count).filter(
-            models.ArticleCard.word_count.isnot(None)
-        ).all()
-        total_count = sum(wc[0] for wc in total_words if wc[0])
-        
-        if total_count <= 5000:
-            logger.debug(f"Total word count {total_count} is within limit")
-            return
-        
-        excess = total_count - 5000
-        logger.info(f"Total word count {total_count} exceeds limit. Need to remove {excess} words.")
-        
-        # Delete oldest consumed articles first, then archived
-        deleted_words = 0
-        for is_consumed_filter in [True, False]:  # consumed first, then archived
-            if deleted_words >= excess:
-                break
-                
-            articles_to_delete = db.query(models.ArticleCard).filter(
-                models.ArticleCard.is_consumed == is_consumed_filter,
-                models.ArticleCard.is_archived == (not is_consumed_filter)  # archived if not consumed
-            ).order_by(models.ArticleCard.id.asc()).all()  # oldest first by ID
-            
-            for article in articles_to_delete:
-                if deleted_words >= excess:
-                    break
-                # Don't delete active feed articles
-                if not article.is_consumed and not article.is_archived:
-                    continue
-                    
-                word_count = article.word_count or 0
-                db.delete(article)
-                deleted_words += word_count
-                logger.info(f"Deleted article '{article.title}' ({word_count} words)")
-        
-        db.commit()
-        logger.info(f"Cleanup complete. Removed {deleted_words} words.")
+        with CLEANUP_LATENCY.time():
+            CLEANUP_WORDS.inc(compact(db))
     except Exception as e:
         logger.error(f"Error during cleanup: {e}", exc_info=True)
         db.rollback()
@@ -122,84 +108,109 @@ def ensure_article_buffer():
     # Check requirements in a short-lived session
     logger.debug("Checking article buffer status")
     db = SessionLocal()
-    needed = 0
-    topics_data = []
+    planned_topics = []
     try:
-        count = db.query(models.ArticleCard).filter(
-            models.ArticleCard.is_archived == False,
-            models.ArticleCard.is_consumed == False
-        ).count()
-        
-        target_count = 5
-        if count < target_count:
-            needed = target_count - count
-            topics = db.query(models.Topic).all()
-            topics_data = [{"id": t.id, "query": t.query, "user_id": t.user_id} for t in topics]
-            logger.info(f"Buffer low: {count}/{target_count} articles. Need {needed} more.")
-        else:
-            logger.debug(f"Buffer healthy: {count}/{target_count} articles.")
+        planned_topics = plan_refill(db)
+        if not planned_topics:
+            logger.debug("All active readers have a healthy buffer.")
     except Exception as e:
         logger.error(f"Error checking article buffer: {e}", exc_info=True)
     finally:
         db.close()
 
-    if needed == 0 or not topics_data:
+    if not planned_topics:
         return
 
-    # Generate articles without holding a DB connection
-    for i in range(needed):
-        topic_data = random.choice(topics_data)
-        logger.info(f"Generating article {i+1}/{needed} for topic: {topic_data['query']}")
-        
-        # Fetch recent articles for context
-        db_context = SessionLocal()
+    # One generation per canonical topic, copied to every subscriber in the plan
+    jobs = group_by_canonical_topic(planned_topics)
+
+    db = SessionLocal()
+    try:
+        for job in jobs:
+            enqueue(db, job["query"], job["targets"], canonical_key=job["canonical_key"])
+        db.commit()
+        logger.info(f"Queued {len(jobs)} generation jobs")
+    except Exception as e:
+        logger.error(f"Error queueing generation jobs: {e}", exc_info=True)
+        db.rollback()
+        return
+    finally:
+        db.close()
+    jobs_available.set()
+
+def process_generation_job(job):
+    """Generate and save the article for a claimed job; raises so the queue retries it."""
+    targets = job["targets"]
+    key = job.get("canonical_key") or canonical_key(job["query"])
+
+    # Recent articles on this topic, so the model avoids repeating them
+    try:
+        recent_articles = recent_digests(key)
+    except Exception as e:
+        logger.error(f"Error fetching context for topic {job['query']}: {e}")
         recent_articles = []
-        try:
-            recent_articles_objs = db_context.query(models.ArticleCard).filter(
-                models.ArticleCard.topic_id == topic_data["id"]
-            ).limit(5).all()
-            recent_articles = [{"title": a.title, "summary": a.summary} for a in recent_articles_objs]
-        except Exception as e:
-            logger.error(f"Error fetching context for topic {topic_data['query']}: {e}")
-        finally:
-            db_context.close()
 
-        try:
-            content = generate_article_content(topic_data["query"], previous_articles=recent_articles)
-            if content:
-                # Save in a new short-lived session
-                db_save = SessionLocal()
-                try:
-                    article_content = content.get("content") or ""
-                    word_count = len(article_content.split()) if article_content else 0
-                    
-                    new_article = models.ArticleCard(
-                        id=str(uuid.uuid4()),
-                        topic_id=topic_data["id"],
-                        user_id=topic_data.get("user_id"),
-                        title=content.get("title"),
-                        summary=content.get("summary"),
-                        content=article_content,
-                        source_url=content.get("source_url"),
-                        published_date=content.get("published_date"),
-                        citations=content.get("citations", []),
-                        image_url=content.get("image_url"),
-                        is_consumed=False,
-                        word_count=word_count
-                    )
-                    db_save.add(new_article)
-                    db_save.commit()
-                    article_logger.info(f"Saved new article: '{new_article.title}' (ID: {new_article.id}, {word_count} words)")
-                    
-                    # Trigger cleanup after saving
-                    cleanup_old_articles()
-                except Exception as e:
-                    logger.error(f"Error saving article to DB: {e}", exc_info=True)
-                finally:
-                    db_save.close()
-        except Exception as e:
-            logger.error(f"Error generating article loop: {e}", exc_info=True)
-            continue
+    content = generate_article_content(job["query"], previous_articles=recent_articles)
+    if not content:
+        raise RuntimeError("Generation returned no article")
+    # A near-repeat of an article this topic already has fails the job, so it is retried later
+    signature = admit_article(key, content)
+    article_ids = save_generated_article(targets, content, signature)
+    if not article_ids:
+        article_index.discard(key, signature)
+        raise RuntimeError("Generated article could not be saved")
+    record_article(key, content)
+    return article_ids
+
+def save_generated_article(targets, content, signature=None):
+    """Persist a generated article for each target topic in one short-lived session.
+
+    Each subscriber gets a full copy rather than a reference to one shared
+    article: read, consumed and archived state, the feed deck, the word ledger
+    and retention all work per row, and a copy can be deleted without checking
+    who else still holds it. Generation, the costly part, still runs once.
+
+    Returns the ids of the saved articles, or an empty list if saving failed.
+    """
+    db_save = SessionLocal()
+    try:
+        article_content = content.get("content") or ""
+        word_count = len(article_content.split()) if article_content else 0
+        
+        new_articles = []
+        for topic_data in targets:
+            new_article = models.ArticleCard(
+                id=str(uuid.uuid4()),
+                topic_id=topic_data["id"],
+                user_id=topic_data.get("user_id"),
+                title=content.get("title"),
+                summary=content.get("summary"),
+                content=article_content,
+                source_url=content.get("source_url"),
+                published_date=content.get("published_date"),
+                citations=content.get("citations", []),
+                image_url=content.get("image_url"),
+                is_consumed=False,
+                word_count=word_count,
+                minhash=pack(signature) if signature is not None else None
+            )
+            db_save.add(new_article)
+            add_to_deck(db_save, new_article)
+            new_articles.append(new_article)
+        db_save.commit()
+        for new_article in new_articles:
+            article_logger.info(f"Saved new article: '{new_article.title}' (ID: {new_article.id}, {word_count} words)")
+        return [a.id for a in new_articles]
+    except Exception as e:
+        logger.error(f"Error saving article to DB: {e}", exc_info=True)
+        return []
+    finally:
+        db_save.close()
+
+# Feed reads and swipes all ask for a refill; funnel them through one in-flight run
+REFILL_DEBOUNCE_SECONDS = float(os.getenv("REFILL_DEBOUNCE_SECONDS", "0.5"))
+buffer_refill = SingleFlight(ensure_article_buffer, debounce_seconds=REFILL_DEBOUNCE_SECONDS, name="Buffer refill")
+watch_single_flight("buffer_refill", buffer_refill)
 
 def migrate_word_counts():
     """Populate word_count for existing articles that don't have it."""
@@ -227,14 +238,40 @@ def migrate_word_counts():
     finally:
         db.close()
 
+def bootstrap_word_ledger():
+    """Build the word count ledger if this database predates it."""
+    db = SessionLocal()
+    try:
+        ensure_ledger(db)
+    except Exception as e:
+        logger.error(f"Error building word count ledger: {e}", exc_info=True)
+        db.rollback()
+    finally:
+        db.close()
+
+def prepare_database():
+    """Data migrations that run before the worker starts writing articles."""
+    # The ledger goes first: backfilled word counts are then applied on top of it
+    # instead of leaving behind a partial ledger that looks already built
+    bootstrap_word_ledger()
+    migrate_word_counts()
+    try:
+        backfill_minhashes(engine)
+    except Exception as e:
+        logger.error(f"Error fingerprinting existing articles: {e}", exc_info=True)
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application startup: running migrations and buffer check")
     # Run migrations and buffer check in background
     import threading
     def startup_tasks():
-        migrate_word_counts()
-        ensure_article_buffer()
+        prepare_database()
+        # Drain the generation job table, including jobs left over from before a restart
+        start_worker(process_generation_job)
+        # Old articles are compacted on their own schedule rather than after every insert
+        start_retention_loop(cleanup_old_articles)
+        buffer_refill.trigger()
     threading.Thread(target=startup_tasks).start()
 
 @app.get("/")
@@ -242,6 +279,13 @@ def read_root():
     logger.debug("Root endpoint accessed")
     return {"message": "Crawler Backend API"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    if not metrics_allowed(request.headers.get("authorization"), request.client.host if request.client else None):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
 # Topics
 @app.get("/topics", response_model=List[schemas.Topic])
 def get_topics(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -269,38 +313,107 @@ def delete_topic(topic_id: str, db: Session = Depends(get_db), current_user: mod
     return {"ok": True}
 
 # Articles
-@app.get("/feed", response_model=List[schemas.ArticleCard])
-def get_feed(background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+@app.get("/feed", response_model=List[schemas.ArticleCard], response_class=FastJSONResponse)
+async def get_feed(background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     logger.debug(f"Fetching article feed for user {current_user.id}")
-    articles = db.query(models.ArticleCard).filter(
-        models.ArticleCard.user_id == current_user.id,
-        models.ArticleCard.is_archived == False,
-        models.ArticleCard.is_consumed == False
-    ).order_by(func.random()).limit(1).all()
+    record_activity(current_user.id)
+    article = await db.run_sync(pop_next_article, current_user.id)
+    await db.commit()
+    articles = CARD.dump([article] if article else [])
     
     # Trigger buffer check
-    background_tasks.add_task(ensure_article_buffer)
+    background_tasks.add_task(buffer_refill.trigger)
     
-    return articles
+    return FastJSONResponse(articles)
 
 @app.post("/articles/{article_id}/swipe")
-def swipe_article(article_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+async def swipe_article(article_id: str, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     logger.info(f"Swiping article: {article_id}")
-    article = db.query(models.ArticleCard).filter(models.ArticleCard.id == article_id, models.ArticleCard.user_id == current_user.id).first()
+    result = await db.execute(select(models.ArticleCard).where(models.ArticleCard.id == article_id, models.ArticleCard.user_id == current_user.id))
+    article = result.scalars().first()
     if not article:
         logger.warning(f"Article not found for swipe: {article_id}")
         raise HTTPException(status_code=404, detail="Article not found")
     
     article.is_consumed = True
-    db.commit()
+    await db.run_sync(remove_from_deck, [article.id])
+    await db.commit()
+    record_activity(current_user.id)
     
-    background_tasks.add_task(ensure_article_buffer)
+    background_tasks.add_task(buffer_refill.trigger)
     return {"ok": True}
 
-@app.get("/archive", response_model=List[schemas.ArticleCard])
-def get_archive(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+# Upper bound on cards dealt by a single /feed/batch call
+MAX_FEED_BATCH = 20
+
+@app.get("/feed/batch", response_model=schemas.FeedBatch, response_class=FastJSONResponse)
+def get_feed_batch(background_tasks: BackgroundTasks, limit: int = 5, cursor: Optional[str] = None, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    logger.debug(f"Fetching feed batch of {limit} for user {current_user.id}")
+    record_activity(current_user.id)
+    held_ids = []
+    if cursor:
+        try:
+            held_ids = decode_cursor(cursor, current_user.id)
+        except ValueError as e:
+            logger.warning(f"Rejected feed cursor for user {current_user.id}: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+
+    limit = max(1, min(limit, MAX_FEED_BATCH))
+    cards = CARD.dump(deal_articles(db, current_user.id, limit, held_ids=held_ids))
+    db.commit()
+
+    background_tasks.add_task(buffer_refill.trigger)
+    return FastJSONResponse({"cards": cards, "cursor": encode_cursor(current_user.id, held_ids + [c["id"] for c in cards])})
+
+@app.post("/feed/ack")
+def ack_feed(ack: schemas.FeedAck, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    try:
+        held_ids = set(decode_cursor(ack.cursor, current_user.id))
+    except ValueError as e:
+        logger.warning(f"Rejected feed cursor for user {current_user.id}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    swiped = set(ack.swiped) & held_ids
+    archived = set(ack.archived) & held_ids
+    ignored = (set(ack.swiped) | set(ack.archived)) - held_ids
+    if ignored:
+        logger.warning(f"Ignoring {len(ignored)} acknowledged cards not dealt under this cursor")
+    logger.info(f"Acknowledging {len(swiped)} swipes and {len(archived)} archives for user {current_user.id}")
+
+    articles = db.query(models.ArticleCard).filter(
+        models.ArticleCard.id.in_(swiped | archived),
+        models.ArticleCard.user_id == current_user.id
+    ).all()
+    for article in articles:
+        if article.id in swiped:
+            article.is_consumed = True
+        if article.id in archived:
+            article.is_archived = True
+    remove_from_deck(db, [a.id for a in articles])
+    db.commit()
+    record_activity(current_user.id)
+
+    background_tasks.add_task(buffer_refill.trigger)
+    return {"ok": True, "swiped": len(swiped), "archived": len(archived)}
+
+@app.get("/archive", response_model=schemas.ArchivePage, response_class=FastJSONResponse)
+async def get_archive(limit: int = DEFAULT_PAGE_SIZE, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(get_current_user_async)):
     logger.debug("Fetching archive")
-    return db.query(models.ArticleCard).filter(models.ArticleCard.user_id == current_user.id, models.ArticleCard.is_archived == True).all()
+    try:
+        rows, next_cursor = await db.run_sync(archive_page, current_user.id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        logger.warning(f"Rejected archive cursor for user {current_user.id}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"items": LIST_ITEM.dump(rows), "next_cursor": next_cursor})
+
+@app.get("/articles/{article_id}", response_model=schemas.ArticleCard)
+def get_article(article_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    logger.debug(f"Fetching article: {article_id}")
+    article = db.query(models.ArticleCard).filter(models.ArticleCard.id == article_id, models.ArticleCard.user_id == current_user.id).first()
+    if not article:
+        logger.warning(f"Article not found: {article_id}")
+        raise HTTPException(status_code=404, detail="Article not found")
+    return article
 
 @app.post("/articles/{article_id}/archive")
 def archive_article(article_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -310,6 +423,7 @@ def archive_article(article_id: str, db: Session = Depends(get_db), current_user
         logger.warning(f"Article not found for archive: {article_id}")
         raise HTTPException(status_code=404, detail="Article not found")
     article.is_archived = True
+    remove_from_deck(db, [article.id])
     db.commit()
     return {"ok": True}
 
@@ -320,6 +434,7 @@ def delete_article(article_id: str, db: Session = Depends(get_db), current_user:
     if not article:
         logger.warning(f"Article not found for deletion: {article_id}")
         raise HTTPException(status_code=404, detail="Article not found")
+    remove_from_deck(db, [article.id])
     db.delete(article)
     db.commit()
     return {"ok": True}
@@ -333,26 +448,70 @@ def generate_article(topic_id: str, db: Session = Depends(get_db), current_user:
         logger.warning(f"Topic not found for generation: {topic_id}")
         raise HTTPException(status_code=404, detail="Topic not found")
     
-    content = generate_article_content(topic.query)
-    if not content:
-        logger.error(f"Failed to generate content for topic: {topic.query}")
-        raise HTTPException(status_code=500, detail="Failed to generate content")
-        
-    new_article = models.ArticleCard(
-        id=str(uuid.uuid4()),
-        topic_id=topic.id,
-        user_id=current_user.id,
-        title=content.get("title"),
-        summary=content.get("summary"),
-        source_url=content.get("source_url"),
-        published_date=content.get("published_date"),
-        citations=content.get("citations", []),
-        image_url=content.get("image_url") or f"https://picsum.photos/seed/{uuid.uuid4()}/400/200"
+    job = enqueue(
+        db, topic.query,
+        [{"id": topic.id, "query": topic.query, "user_id": current_user.id}],
+        canonical_key=topic.canonical_key
     )
-    
-    db.add(new_article)
     db.commit()
-    return {"ok": True}
-    db.refresh(new_article)
-    article_logger.info(f"Manually generated and saved article: '{new_article.title}'")
-    return new_article
+    jobs_available.set()
+    return {"ok": True, "job_id": job.id}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    job = db.get(models.GenerationJob, job_id)
+    if not job or not any(t.get("user_id") == current_user.id for t in job.targets or []):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "id": job.id,
+        "state": job.state,
+        "attempts": job.attempts,
+        "next_run_at": job.next_run_at,
+        "last_error": job.last_error,
+        "article_ids": [a for a, t in zip(job.article_ids or [], job.targets) if t.get("user_id") == current_user.id],
+    }
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/generate/{topic_id}/stream")
+def generate_article_stream(topic_id: str, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    """Generate an article for a topic, streaming it to the client as Server-Sent Events.
+
+    Emits "title", "summary" and "content" events carrying {"delta": text} as
+    the model writes, then "done" with the saved article id, or "error".
+    """
+    logger.info(f"Streamed generation requested for topic: {topic_id}")
+    topic = db.query(models.Topic).filter(models.Topic.id == topic_id, models.Topic.user_id == current_user.id).first()
+    if not topic:
+        logger.warning(f"Topic not found for generation: {topic_id}")
+        raise HTTPException(status_code=404, detail="Topic not found")
+    topic_data = {"id": topic.id, "query": topic.query, "user_id": current_user.id}
+    key = topic.canonical_key or canonical_key(topic.query)
+
+    def events():
+        try:
+            for kind, payload in stream_article_content(topic_data["query"], previous_articles=recent_digests(key)):
+                if kind == "article":
+                    try:
+                        signature = admit_article(key, payload)
+                    except DuplicateArticleError as e:
+                        logger.warning(f"Discarding streamed article for topic {topic_data['query']}: {e}")
+                        yield _sse("error", {"detail": "The generated article repeats one already in this topic"})
+                        return
+                    article_ids = save_generated_article([topic_data], payload, signature)
+                    if not article_ids:
+                        article_index.discard(key, signature)
+                        yield _sse("error", {"detail": "Failed to save article"})
+                        return
+                    record_article(key, payload)
+                    yield _sse("done", {"id": article_ids[0], "title": payload.get("title")})
+                elif kind == "error":
+                    yield _sse("error", {"detail": payload})
+                else:
+                    yield _sse(kind, {"delta": payload})
+        except Exception as e:
+            logger.error(f"Error streaming article for topic {topic_data['query']}: {e}", exc_info=True)
+            yield _sse("error", {"detail": "Failed to generate content"})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,112 @@
+"""Schema migrations for databases created by an older version of the models.
+
+``Base.metadata.create_all`` only creates missing tables, so columns and
+indexes added to existing tables are applied here at startup. Every step is
+idempotent and checks the live schema before changing it.
+"""
+import random
+from datetime import datetime
+from sqlalchemy import inspect, text, bindparam
+from sqlalchemy.engine import Engine
+import models
+from services.topics import canonical_key
+from services.dedup import minhash, article_text, pack
+from logging_config import logger
+
+EPOCH = datetime(1970, 1, 1)
+
+def add_column_if_missing(engine: Engine, table: str, column: str, ddl_type: str) -> bool:
+    columns = {c["name"] for c in inspect(engine).get_columns(table)}
+    if column in columns:
+        return False
+    logger.info(f"Migration: adding column {table}.{column}")
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    return True
+
+def create_indexes_if_missing(engine: Engine, table) -> None:
+    existing = {ix["name"] for ix in inspect(engine).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing:
+            logger.info(f"Migration: creating index {index.name}")
+            index.create(bind=engine)
+
+def backfill_rand_keys(engine: Engine, batch_size: int = 5000) -> None:
+    """Give every article without a feed sort key a uniform random one."""
+    articles = models.ArticleCard.__table__
+    total = 0
+    with engine.begin() as conn:
+        while True:
+            ids = conn.execute(
+                articles.select().with_only_columns(articles.c.id)
+                .where(articles.c.rand_key.is_(None)).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            conn.execute(
+                articles.update().where(articles.c.id == bindparam("article_id")).values(rand_key=bindparam("new_key")),
+                [{"article_id": article_id, "new_key": random.random()} for article_id in ids]
+            )
+            total += len(ids)
+    if total:
+        logger.info(f"Migration: assigned feed sort keys to {total} articles")
+
+def backfill_created_at(engine: Engine) -> None:
+    """Date undated legacy articles at the epoch so keyset pages can order them, oldest first."""
+    articles = models.ArticleCard.__table__
+    with engine.begin() as conn:
+        result = conn.execute(articles.update().where(articles.c.created_at.is_(None)).values(created_at=EPOCH))
+    if result.rowcount:
+        logger.info(f"Migration: dated {result.rowcount} articles without created_at")
+
+def backfill_canonical_keys(engine: Engine) -> None:
+    """Compute the shared-topic key for topics created before it existed."""
+    topics = models.Topic.__table__
+    with engine.begin() as conn:
+        rows = conn.execute(
+            topics.select().with_only_columns(topics.c.id, topics.c.query)
+            .where(topics.c.canonical_key.is_(None))
+        ).all()
+        if rows:
+            conn.execute(
+                topics.update().where(topics.c.id == bindparam("topic_id")).values(canonical_key=bindparam("key")),
+                [{"topic_id": topic_id, "key": canonical_key(query)} for topic_id, query in rows]
+            )
+            logger.info(f"Migration: assigned canonical keys to {len(rows)} topics")
+
+def backfill_minhashes(engine: Engine, batch_size: int = 500) -> None:
+    """Fingerprint existing articles so the duplicate index can see them.
+
+    Hashing is slow, so this runs from the startup thread rather than
+    ``run_migrations`` and commits each batch to keep write locks short.
+    """
+    articles = models.ArticleCard.__table__
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                articles.select().with_only_columns(articles.c.id, articles.c.title, articles.c.summary, articles.c.content)
+                .where(articles.c.minhash.is_(None)).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                articles.update().where(articles.c.id == bindparam("article_id")).values(minhash=bindparam("signature")),
+                [
+                    {"article_id": row.id, "signature": pack(minhash(article_text(row._mapping)))}
+                    for row in rows
+                ]
+            )
+        total += len(rows)
+    if total:
+        logger.info(f"Migration: fingerprinted {total} articles for duplicate detection")
+
+def run_migrations(engine: Engine) -> None:
+    add_column_if_missing(engine, "articles", "rand_key", "FLOAT")
+    backfill_rand_keys(engine)
+    backfill_created_at(engine)
+    create_indexes_if_missing(engine, models.ArticleCard.__table__)
+    add_column_if_missing(engine, "articles", "minhash", "BLOB")
+    add_column_if_missing(engine, "topics", "canonical_key", "VARCHAR")
+    backfill_canonical_keys(engine)
+    create_indexes_if_missing(engine, models.Topic.__table__)
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, JSON, DateTime, Float, Index, LargeBinary, text
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
+import random
 
 class User(Base):
     __tablename__ = "users"
@@ -21,6 +22,8 @@ class Topic(Base):
     id = Column(String, primary_key=True, index=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     query = Column(String, index=True)
+    # Normalized query shared by every user who follows the same topic
+    canonical_key = Column(String, index=True)
     icon = Column(String)
     
     user = relationship("User", back_populates="topics")
@@ -44,6 +47,70 @@ class ArticleCard(Base):
     is_consumed = Column(Boolean, default=False)
     word_count = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Uniform random sort key so the feed can seek to a random card without sorting
+    rand_key = Column(Float, default=random.random)
+    # MinHash signature of title, summary and content, for near-duplicate checks
+    minhash = Column(LargeBinary, nullable=True)
 
     user = relationship("User", back_populates="articles")
     topic = relationship("Topic", back_populates="articles")
+
+    __table_args__ = (
+        Index("ix_articles_feed_rand", "user_id", "is_archived", "is_consumed", "rand_key"),
+        Index("ix_articles_archive_page", "user_id", "is_archived", "created_at", "id"),
+        Index("ix_articles_topic_created", "topic_id", "created_at"),
+        # Retention reads consumed then archived articles oldest first in this order. Partial, so
+        # lookups of unread cards (is_archived = 0 AND is_consumed = 0) can never pick it
+        Index(
+            "ix_articles_retention", "is_archived", "created_at", "id",
+            sqlite_where=text("is_consumed = 1 OR is_archived = 1"),
+            postgresql_where=text("is_consumed OR is_archived"),
+        ),
+    )
+
+class WordCountLedger(Base):
+    __tablename__ = "word_count_ledger"
+
+    # "__global__" for the whole table, "__built__" as the rebuilt marker, otherwise a user id
+    scope = Column(String, primary_key=True)
+    total_words = Column(Integer, default=0, nullable=False)
+    # Words held by consumed or archived articles, i.e. what cleanup may remove
+    reclaimable_words = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class FeedDeckEntry(Base):
+    __tablename__ = "feed_deck"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    article_id = Column(String, ForeignKey("articles.id"), nullable=False, index=True)
+    # Cards are dealt in ascending position: a rebuild shuffles by rand_key, new cards are appended after the last
+    position = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_feed_deck_user_position", "user_id", "position"),
+    )
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+
+    id = Column(String, primary_key=True)
+    query = Column(String, nullable=False)
+    canonical_key = Column(String, index=True)
+    # Topic dicts ({"id", "query", "user_id"}) that each receive a copy of the article
+    targets = Column(JSON, default=list)
+    # queued -> running -> done, or back to queued for a retry, or failed
+    state = Column(String, default="queued", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    max_attempts = Column(Integer, default=5, nullable=False)
+    next_run_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    article_ids = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_generation_jobs_claim", "state", "next_run_at"),
+    )
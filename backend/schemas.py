@@ -37,6 +37,37 @@ class ArticleCard(ArticleCardBase):
     class Config:
         from_attributes = True
 
+class ArticleListItem(BaseModel):
+    """Archive listing entry; the body and citations come from GET /articles/{id}."""
+    id: str
+    topic_id: Optional[str] = None
+    title: str
+    summary: str
+    image_url: Optional[str] = None
+    source_url: Optional[str] = None
+    published_date: Optional[str] = None
+    is_archived: bool = False
+    is_read: bool = False
+    is_consumed: bool = False
+    word_count: int = 0
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class ArchivePage(BaseModel):
+    items: List[ArticleListItem]
+    next_cursor: Optional[str] = None
+
+class FeedBatch(BaseModel):
+    cards: List[ArticleCard]
+    cursor: str
+
+class FeedAck(BaseModel):
+    cursor: str
+    swiped: List[str] = []
+    archived: List[str] = []
+
 class UserBase(BaseModel):
     email: str
     name: Optional[str] = None
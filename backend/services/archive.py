@@ -0,0 +1,55 @@
+import base64
+from datetime import datetime
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import Session
+import models, schemas
+from services.serialization import RowSerializer
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Only the columns the archive list shows; content and citations stay in the database
+LIST_ITEM = RowSerializer(schemas.ArticleListItem, models.ArticleCard)
+LIST_COLUMNS = LIST_ITEM.columns
+
+def encode_cursor(created_at: datetime, article_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{article_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    """Return (created_at, id) from a page cursor, raising ValueError if it is malformed."""
+    try:
+        created_at, article_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return datetime.fromisoformat(created_at), article_id
+    except Exception:
+        raise ValueError("Invalid archive cursor")
+
+def archive_page(db: Session, user_id: str, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None):
+    """Return (rows, next_cursor) for one page of the user's archive, newest first.
+
+    Pages are keyed on (created_at, id) so every page is an index range scan on
+    ix_articles_archive_page no matter how deep the client has scrolled.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    article = models.ArticleCard
+    query = select(*LIST_COLUMNS).where(
+        article.user_id == user_id,
+        article.is_archived == True,
+        # Cursors need a date; migrations date legacy rows, so this only guards against stragglers
+        article.created_at.isnot(None)
+    )
+    if cursor:
+        created_at, article_id = decode_cursor(cursor)
+        query = query.where(or_(
+            article.created_at < created_at,
+            and_(article.created_at == created_at, article.id < article_id)
+        ))
+    query = query.order_by(article.created_at.desc(), article.id.desc()).limit(limit + 1)
+
+    # One extra row tells us whether there is another page; LIMIT bounds what is loaded
+    rows = db.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
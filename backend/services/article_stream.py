@@ -0,0 +1,81 @@
+import re
+
+# Simple JSON escapes; \u escapes are handled separately
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+class ArticleStreamParser:
+    """Pull the text of selected string fields out of a JSON article while it is still arriving.
+
+    Feed it raw chunks of the model's output; each call returns the newly
+    decoded (field, text) pieces for any of ``fields`` whose value has started.
+    The full raw text is kept in ``text`` for the final parse.
+    """
+
+    def __init__(self, fields=("title", "summary", "content")):
+        self.fields = fields
+        self.text = ""
+        self._patterns = {f: re.compile(r'(?<!\\)"%s"\s*:\s*"' % re.escape(f)) for f in fields}
+        self._positions = {}
+        self._closed = set()
+
+    def feed(self, chunk: str) -> list:
+        self.text += chunk
+        pieces = []
+        for field in self.fields:
+            if field in self._closed:
+                continue
+            if field not in self._positions:
+                match = self._patterns[field].search(self.text)
+                if not match:
+                    continue
+                self._positions[field] = match.end()
+            piece, self._positions[field], closed = self._decode_from(self._positions[field])
+            if piece:
+                pieces.append((field, piece))
+            if closed:
+                self._closed.add(field)
+        return pieces
+
+    def _decode_from(self, i: int):
+        """Decode string characters from raw index ``i`` up to the closing quote or an incomplete escape."""
+        text, n = self.text, len(self.text)
+        chars = []
+        while i < n:
+            c = text[i]
+            if c == '"':
+                return "".join(chars), i + 1, True
+            if c != '\\':
+                chars.append(c)
+                i += 1
+                continue
+            if i + 1 >= n:
+                break
+            escape = text[i + 1]
+            if escape != 'u':
+                chars.append(_ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            if i + 6 > n:
+                break
+            try:
+                code = int(text[i + 2:i + 6], 16)
+            except ValueError:
+                chars.append(text[i + 2:i + 6])
+                i += 6
+                continue
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: wait for its partner so the pair decodes to one character
+                if i + 12 > n:
+                    break
+                if text[i + 6:i + 8] == '\\u':
+                    try:
+                        low = int(text[i + 8:i + 12], 16)
+                    except ValueError:
+                        low = None
+                    if low is not None and 0xDC00 <= low < 0xE000:
+                        chars.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                        continue
+            chars.append(chr(code))
+            i += 6
+        return "".join(chars), i, False
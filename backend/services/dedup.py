@@ -0,0 +1,212 @@
+"""Near-duplicate detection for generated articles.
+
+Each article gets a MinHash signature of its word shingles: ``DEDUP_PERMUTATIONS``
+minimum hash values. The share of matching slots between two signatures
+estimates the Jaccard similarity of the articles, and an article at least
+``DEDUP_MIN_SIMILARITY`` similar to one its topic already has is a
+near-duplicate.
+
+Per canonical topic, the index splits every signature into bands of
+``DEDUP_BAND_ROWS`` slots and keeps a dict per band (locality-sensitive
+hashing). Articles that are similar are very likely to match exactly on at
+least one band, so a lookup only compares the few signatures sharing a band,
+not the topic's whole history.
+
+A topic's signatures are loaded from the ``articles.minhash`` column the
+first time it is checked. After that the index is updated in place as
+articles are saved, keeping the newest ``DEDUP_HISTORY_PER_TOPIC``. At most
+``DEDUP_MAX_TOPICS`` topics are held, least recently checked evicted first,
+and each is reloaded after ``DEDUP_TOPIC_TTL_SECONDS``.
+"""
+import hashlib
+import os
+import random
+import re
+import struct
+import threading
+from collections import OrderedDict
+from sqlalchemy import select
+from sqlalchemy.sql import func
+import models
+from database import SessionLocal
+from logging_config import logger
+from services.ttl_cache import TTLCache
+
+DEDUP_PERMUTATIONS = 128
+DEDUP_BAND_ROWS = int(os.getenv("DEDUP_BAND_ROWS", "4"))
+DEDUP_MIN_SIMILARITY = float(os.getenv("DEDUP_MIN_SIMILARITY", "0.6"))
+DEDUP_HISTORY_PER_TOPIC = int(os.getenv("DEDUP_HISTORY_PER_TOPIC", "500"))
+DEDUP_MAX_TOPICS = int(os.getenv("DEDUP_MAX_TOPICS", "1000"))
+DEDUP_TOPIC_TTL_SECONDS = float(os.getenv("DEDUP_TOPIC_TTL_SECONDS", "3600"))
+SHINGLE_SIZE = 3
+
+_WORD = re.compile(r"\w+")
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed seed: stored signatures must stay comparable across restarts
+_rng = random.Random(20240101)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(DEDUP_PERMUTATIONS)]
+_PACK = struct.Struct(f"<{DEDUP_PERMUTATIONS}I")
+
+class DuplicateArticleError(RuntimeError):
+    pass
+
+def article_text(content) -> str:
+    return " ".join(content.get(field) or "" for field in ("title", "summary", "content"))
+
+def shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash(text: str) -> tuple:
+    """MinHash signature of the text's lower-cased word shingles."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode(), digest_size=8).digest(), "little") for s in shingles(text)]
+    if not hashes:
+        return (_MAX_HASH,) * DEDUP_PERMUTATIONS
+    return tuple(
+        min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+def similarity(a: tuple, b: tuple) -> float:
+    """Estimated Jaccard similarity of the articles behind two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+def pack(signature: tuple) -> bytes:
+    return _PACK.pack(*signature)
+
+def unpack(data: bytes) -> tuple:
+    return _PACK.unpack(data)
+
+class _TopicIndex:
+    __slots__ = ("entries", "bands")
+
+    def __init__(self, band_count: int):
+        # signature -> label, oldest first
+        self.entries = OrderedDict()
+        self.bands = [dict() for _ in range(band_count)]
+
+def load_topic_signatures(key: str, limit: int):
+    """Return [(signature, title)] for a canonical topic's newest distinct articles, newest first."""
+    article, topic = models.ArticleCard, models.Topic
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(article.minhash, func.max(article.title))
+            .join(topic, article.topic_id == topic.id)
+            .where(topic.canonical_key == key, article.minhash.isnot(None))
+            .group_by(article.minhash)
+            .order_by(func.max(article.created_at).desc())
+            .limit(limit)
+        ).all()
+        return [(unpack(data), title) for data, title in rows]
+    finally:
+        db.close()
+
+class NearDuplicateIndex:
+    def __init__(self, min_similarity: float = DEDUP_MIN_SIMILARITY, band_rows: int = DEDUP_BAND_ROWS,
+                 history: int = DEDUP_HISTORY_PER_TOPIC, loader=load_topic_signatures,
+                 max_topics: int = DEDUP_MAX_TOPICS, ttl: float = DEDUP_TOPIC_TTL_SECONDS):
+        self.min_similarity = min_similarity
+        self.band_rows = band_rows
+        self.band_count = DEDUP_PERMUTATIONS // band_rows
+        self.history = history
+        self.loader = loader
+        # canonical key -> _TopicIndex
+        self._topics = TTLCache(max_topics, ttl)
+        self._lock = threading.Lock()
+
+    def _bands(self, signature: tuple):
+        rows = self.band_rows
+        return [signature[i * rows:(i + 1) * rows] for i in range(self.band_count)]
+
+    def _topic(self, key: str) -> _TopicIndex:
+        index = self._topics.get(key)
+        if index is None:
+            index = _TopicIndex(self.band_count)
+            signatures = self.loader(key, self.history) if self.loader else []
+            for signature, label in reversed(signatures):
+                self._insert(index, signature, label)
+            self._topics.set(key, index)
+            logger.debug(f"Loaded {len(index.entries)} article signatures for topic '{key}'")
+        return index
+
+    def _insert(self, index: _TopicIndex, signature: tuple, label):
+        if signature in index.entries:
+            index.entries.move_to_end(signature)
+            return
+        index.entries[signature] = label
+        for band, value in zip(index.bands, self._bands(signature)):
+            band.setdefault(value, set()).add(signature)
+        if len(index.entries) > self.history:
+            self._remove(index, next(iter(index.entries)))
+
+    def _remove(self, index: _TopicIndex, signature: tuple):
+        index.entries.pop(signature, None)
+        for band, value in zip(index.bands, self._bands(signature)):
+            members = band.get(value)
+            if members is not None:
+                members.discard(signature)
+                if not members:
+                    del band[value]
+
+    def _closest(self, index: _TopicIndex, signature: tuple):
+        candidates = set()
+        for band, value in zip(index.bands, self._bands(signature)):
+            candidates.update(band.get(value, ()))
+        best = None
+        for candidate in candidates:
+            score = similarity(signature, candidate)
+            if score >= self.min_similarity and (best is None or score > best[1]):
+                best = (candidate, score)
+        return best
+
+    def find(self, key: str, signature: tuple):
+        """Return (label, similarity) of the closest near-duplicate in the topic, or None."""
+        with self._lock:
+            index = self._topic(key)
+            match = self._closest(index, signature)
+            return (index.entries[match[0]], match[1]) if match else None
+
+    def admit(self, key: str, signature: tuple, label=None):
+        """Add the signature unless it near-duplicates one already indexed.
+
+        Returns None when admitted, otherwise (label, similarity) of the match.
+        Checking and adding happen under one lock, so two concurrent
+        generations of the same story cannot both get in.
+        """
+        with self._lock:
+            index = self._topic(key)
+            match = self._closest(index, signature)
+            if match:
+                return index.entries[match[0]], match[1]
+            self._insert(index, signature, label)
+            return None
+
+    def discard(self, key: str, signature: tuple):
+        """Forget a signature, e.g. when the article it was admitted for could not be saved."""
+        with self._lock:
+            index = self._topics.get(key)
+            if index is not None:
+                self._remove(index, signature)
+
+    def stats(self) -> dict:
+        with self._lock:
+            topics = self._topics.values()
+            return {"topics": len(topics), "signatures": sum(len(t.entries) for t in topics)}
+
+article_index = NearDuplicateIndex()
+
+def admit_article(key: str, content: dict) -> tuple:
+    """Reserve a generated article's signature in its topic's index and return it.
+
+    Raises DuplicateArticleError if the topic already has a near-identical article.
+    """
+    signature = minhash(article_text(content))
+    match = article_index.admit(key, signature, content.get("title"))
+    if match:
+        title, score = match
+        raise DuplicateArticleError(f"Near-duplicate of '{title}' ({score:.0%} similar)")
+    return signature
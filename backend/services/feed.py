@@ -0,0 +1,123 @@
+import random
+from datetime import datetime, timedelta
+from jose import JWTError, jwt
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.orm import Session
+import models, schemas
+from auth import SECRET_KEY, ALGORITHM
+from logging_config import logger
+from services.serialization import RowSerializer
+
+# Give up after this many rounds of stale deck entries in a single deal
+MAX_STALE_POPS = 10
+# A cursor remembers at most this many outstanding cards
+MAX_CURSOR_CARDS = 100
+CURSOR_EXPIRE_MINUTES = 24 * 60
+# Dealt cards are read as plain rows with exactly the fields a card carries
+CARD = RowSerializer(schemas.ArticleCard, models.ArticleCard)
+
+def add_to_deck(db: Session, article: models.ArticleCard):
+    """Append a freshly generated article to the end of its owner's deck (flushed with the caller's commit).
+
+    The position is computed in the INSERT itself, one past the deck's current
+    last card, so the new card cannot jump ahead of cards already waiting.
+    """
+    if article.rand_key is None:
+        article.rand_key = random.random()
+    deck = models.FeedDeckEntry
+    tail = select(func.coalesce(func.max(deck.position), 0) + 1).where(deck.user_id == article.user_id).scalar_subquery()
+    db.add(deck(user_id=article.user_id, article_id=article.id, position=tail))
+
+def remove_from_deck(db: Session, article_ids):
+    """Drop any deck entries for the given articles."""
+    db.execute(
+        delete(models.FeedDeckEntry).where(models.FeedDeckEntry.article_id.in_(list(article_ids))),
+        execution_options={"synchronize_session": False}
+    )
+
+def rebuild_deck(db: Session, user_id: str, exclude_ids=()) -> int:
+    """Refill a user's deck with every unread article, in rand_key order.
+
+    Articles in ``exclude_ids`` are left out because the client already holds them.
+    """
+    db.execute(
+        delete(models.FeedDeckEntry).where(models.FeedDeckEntry.user_id == user_id),
+        execution_options={"synchronize_session": False}
+    )
+    unread = select(
+        models.ArticleCard.user_id, models.ArticleCard.id, models.ArticleCard.rand_key
+    ).where(
+        models.ArticleCard.user_id == user_id,
+        models.ArticleCard.is_archived == False,
+        models.ArticleCard.is_consumed == False
+    )
+    if exclude_ids:
+        unread = unread.where(models.ArticleCard.id.notin_(list(exclude_ids)))
+    result = db.execute(
+        insert(models.FeedDeckEntry).from_select(["user_id", "article_id", "position"], unread)
+    )
+    logger.debug(f"Rebuilt feed deck for user {user_id} with {result.rowcount} cards")
+    return result.rowcount
+
+def _pop_article_ids(db: Session, user_id: str, count: int) -> list:
+    head = select(models.FeedDeckEntry.id).where(
+        models.FeedDeckEntry.user_id == user_id
+    ).order_by(models.FeedDeckEntry.position).limit(count)
+    popped = db.execute(
+        delete(models.FeedDeckEntry).where(models.FeedDeckEntry.id.in_(head))
+        .returning(models.FeedDeckEntry.article_id, models.FeedDeckEntry.position),
+        execution_options={"synchronize_session": False}
+    ).all()
+    # RETURNING rows come back in no particular order
+    return [article_id for article_id, _ in sorted(popped, key=lambda row: row.position)]
+
+def deal_articles(db: Session, user_id: str, count: int, held_ids=()) -> list:
+    """Deal up to ``count`` cards from the user's deck.
+
+    Each pop is one indexed DELETE ... RETURNING. When the deck runs dry it is
+    rebuilt lazily from the articles table, which puts back cards that were
+    shown but never swiped, apart from those in ``held_ids`` or already dealt
+    by this call. Cards are returned as rows of ``CARD.columns``. The caller
+    commits.
+    """
+    articles = []
+    rebuilt = False
+    for _ in range(MAX_STALE_POPS):
+        article_ids = _pop_article_ids(db, user_id, count - len(articles))
+        if not article_ids:
+            dealt = set(held_ids) | {a.id for a in articles}
+            if rebuilt or not rebuild_deck(db, user_id, exclude_ids=dealt):
+                break
+            rebuilt = True
+            continue
+        rows = db.execute(select(*CARD.columns).where(
+            models.ArticleCard.id.in_(article_ids),
+            models.ArticleCard.is_archived == False,
+            models.ArticleCard.is_consumed == False
+        )).all()
+        order = {article_id: i for i, article_id in enumerate(article_ids)}
+        articles.extend(sorted(rows, key=lambda row: order[row.id]))
+        if len(articles) >= count:
+            break
+    return articles
+
+def pop_next_article(db: Session, user_id: str):
+    """Deal a single card, or None if the user has nothing unread."""
+    articles = deal_articles(db, user_id, 1)
+    return articles[0] if articles else None
+
+def encode_cursor(user_id: str, article_ids) -> str:
+    """Sign the set of cards a client is holding into an opaque cursor."""
+    article_ids = list(article_ids)[-MAX_CURSOR_CARDS:]
+    expire = datetime.utcnow() + timedelta(minutes=CURSOR_EXPIRE_MINUTES)
+    return jwt.encode({"sub": user_id, "ids": article_ids, "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_cursor(cursor: str, user_id: str) -> list:
+    """Return the card ids held under a cursor, raising ValueError if it is not valid for this user."""
+    try:
+        payload = jwt.decode(cursor, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        raise ValueError(f"Invalid feed cursor: {e}")
+    if payload.get("sub") != user_id:
+        raise ValueError("Feed cursor belongs to another user")
+    return payload.get("ids", [])
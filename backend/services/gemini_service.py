@@ -1,19 +1,32 @@
 import os
-from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-import json
 from datetime import datetime
 import uuid
 import base64
+from contextlib import closing
 from logging_config import logger, article_logger
+from services.article_stream import ArticleStreamParser
+from services.json_extract import extract_json_object
+from services.rate_limiter import gemini_limiter, estimate_tokens, RateLimitTimeout, GEMINI_SLOT_WAIT_SECONDS
+from services.resilience import ResilientCall, CircuitBreaker, CircuitOpenError, DeadlineExceeded, stream_with_deadline
+from services.llm_backends import create_client
+from services.metrics import GeminiCallTimer, count_gemini_failure, failure_reason
 
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-client = None
-if GEMINI_API_KEY:
-    client = genai.Client(api_key=GEMINI_API_KEY)
+# Gemini, or an offline stand-in when LLM_BACKEND=synthetic
+client = create_client(GEMINI_API_KEY)
+
+# A call that has not produced an article by this deadline is abandoned
+GEMINI_CALL_DEADLINE_SECONDS = float(os.getenv("GEMINI_CALL_DEADLINE_SECONDS", "180"))
+# A stream that goes this long without a chunk is abandoned too
+GEMINI_STREAM_CHUNK_SECONDS = float(os.getenv("GEMINI_STREAM_CHUNK_SECONDS", "90"))
+# Send a second request when the first runs past the recent p95 latency
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "60"))
 
 # Configuration for the model
 generate_content_config = types.GenerateContentConfig(
@@ -25,7 +38,9 @@ generate_content_config = types.GenerateContentConfig(
     top_k=40,
     max_output_tokens=8192,
     response_mime_type="application/json",
-    tools=[types.Tool(google_search=types.GoogleSearch())]
+    tools=[types.Tool(google_search=types.GoogleSearch())],
+    # Lets the HTTP client give up on calls the deadline has already abandoned
+    http_options=types.HttpOptions(timeout=int(GEMINI_CALL_DEADLINE_SECONDS * 1000))
 )
 
 MODEL_NAME = "gemini-3-pro-preview"
@@ -34,14 +49,7 @@ def generate_article_image(title: str, summary: str) -> str:
     """Generate an image for the article based on title and summary. Returns None to use black screens."""
     return None
 
-def generate_article_content(topic_query: str, previous_articles: list = None):
-    if not GEMINI_API_KEY:
-        logger.error("GEMINI_API_KEY not set")
-        raise Exception("GEMINI_API_KEY not set")
-
-    article_logger.info(f"Starting article generation for topic: {topic_query}")
-    all_citations = set()
-    
+def build_article_prompt(topic_query: str, previous_articles: list = None) -> str:
     avoid_context = ""
     if previous_articles:
         titles = [a.get('title', 'Unknown') for a in previous_articles]
@@ -52,7 +60,7 @@ def generate_article_content(topic_query: str, previous_articles: list = None):
         )
 
     # Single comprehensive API call that handles research + synthesis
-    prompt = f"""
+    return f"""
     You are a senior research analyst tasked with researching and writing a comprehensive article about: "{topic_query}".
     
     Context to Avoid (ALREADY COVERED - DO NOT REPEAT):
@@ -84,57 +92,171 @@ def generate_article_content(topic_query: str, previous_articles: list = None):
     
     Ensure the information is current, factual, and well-synthesized from your research.
     """
-    
+
+def extract_grounding_citations(response) -> set:
+    """Collect source URLs from a response's grounding metadata."""
+    citations = set()
+    if hasattr(response, 'candidates') and response.candidates:
+        candidate = response.candidates[0]
+        if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
+            chunks = getattr(candidate.grounding_metadata, 'grounding_chunks', None)
+            if chunks:
+                for chunk in chunks:
+                    if chunk.web and chunk.web.uri:
+                        citations.add(chunk.web.uri)
+    return citations
+
+def parse_article_json(text: str):
+    """Parse the model's JSON article, returning None if it cannot be recovered."""
+    if not text:
+        logger.warning("Empty response text")
+        return None
     try:
+        content = extract_json_object(text)
+    except Exception as e:
+        logger.error(f"Unexpected error parsing JSON: {e}")
+        return None
+    if content is None:
+        logger.error(f"Failed to extract article JSON from response ({len(text)} chars)")
+    return content
+
+def prompt_token_count(response):
+    """Input tokens billed for a response, or None if the API did not report usage."""
+    usage = getattr(response, 'usage_metadata', None)
+    return getattr(usage, 'prompt_token_count', None) if usage else None
+
+def finalize_article(content: dict, grounding_citations: set) -> dict:
+    # Merge citations from grounding metadata with generated citations
+    existing_citations = set(content.get('citations', []))
+    final_citations = list(existing_citations.union(grounding_citations))
+    content['citations'] = final_citations
+    
+    # No image generation - frontend will use black backgrounds
+    content['image_url'] = None
+    return content
+
+def admit_model_call(timeout: float, prompt: str):
+    """Rate limiter slot for one call; waits for quota and backs off when Gemini reports overload (429/5xx)."""
+    return gemini_limiter.slot(estimate_tokens(prompt), timeout=timeout)
+
+def call_model(usage, prompt: str):
+    """One generate_content call, made while holding the limiter slot ``usage`` from admit_model_call."""
+    with GeminiCallTimer("generate") as call:
         response = client.models.generate_content(
             model=MODEL_NAME,
             contents=prompt,
             config=generate_content_config
         )
+        usage.record_usage(prompt_token_count(response))
+        call.record_usage(response)
+    return response
+
+gemini_breaker = CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET_SECONDS, name="Gemini")
+resilient_call_model = ResilientCall(
+    call_model,
+    deadline_seconds=GEMINI_CALL_DEADLINE_SECONDS,
+    breaker=gemini_breaker,
+    hedge=GEMINI_HEDGE_ENABLED,
+    name="Gemini",
+    admit=admit_model_call,
+    admit_timeout=GEMINI_SLOT_WAIT_SECONDS,
+)
+
+def generate_article_content(topic_query: str, previous_articles: list = None):
+    if client is None:
+        logger.error("GEMINI_API_KEY not set and no other LLM_BACKEND configured")
+        raise Exception("GEMINI_API_KEY not set")
+
+    article_logger.info(f"Starting article generation for topic: {topic_query}")
+    prompt = build_article_prompt(topic_query, previous_articles)
+    
+    try:
+        response = resilient_call_model(prompt)
         
         # Extract grounding metadata
-        if hasattr(response, 'candidates') and response.candidates:
-            candidate = response.candidates[0]
-            if hasattr(candidate, 'grounding_metadata') and candidate.grounding_metadata:
-                chunks = getattr(candidate.grounding_metadata, 'grounding_chunks', None)
-                if chunks:
-                    for chunk in chunks:
-                        if chunk.web and chunk.web.uri:
-                            all_citations.add(chunk.web.uri)
-
-        try:
-            if not response.text:
-                logger.warning("Empty response text")
-                return None
-            content = json.loads(response.text)
-        except json.JSONDecodeError:
-            logger.warning("JSON parse failed, attempting cleanup")
-            cleaned_text = response.text.strip()
-            if cleaned_text.startswith("```json"):
-                cleaned_text = cleaned_text[7:]
-            elif cleaned_text.startswith("```"):
-                cleaned_text = cleaned_text[3:]
-            if cleaned_text.endswith("```"):
-                cleaned_text = cleaned_text[:-3]
-            try:
-                content = json.loads(cleaned_text)
-            except json.JSONDecodeError:
-                logger.error("Failed to parse article JSON even after cleanup")
-                return None
-        except Exception as e:
-            logger.error(f"Unexpected error parsing JSON: {e}")
+        all_citations = extract_grounding_citations(response)
+
+        content = parse_article_json(response.text)
+        if content is None:
+            count_gemini_failure("unparseable")
             return None
-        
-        # Merge citations from grounding metadata with generated citations
-        existing_citations = set(content.get('citations', []))
-        final_citations = list(existing_citations.union(all_citations))
-        content['citations'] = final_citations
-        
-        # No image generation - frontend will use black backgrounds
-        content['image_url'] = None
+        content = finalize_article(content, all_citations)
         
         article_logger.info(f"Successfully generated article: '{content.get('title')}' for topic: {topic_query}")
         return content
+    except CircuitOpenError as e:
+        # Gemini is unhealthy; existing cards keep serving until it recovers
+        count_gemini_failure(failure_reason(e))
+        logger.warning(f"Skipping generation for topic '{topic_query}': Gemini circuit is open")
+        return None
     except Exception as e:
+        if isinstance(e, (DeadlineExceeded, RateLimitTimeout)):
+            # API errors are counted per attempt in call_model; these never reach it
+            count_gemini_failure(failure_reason(e))
         logger.error(f"Error generating content for topic '{topic_query}': {e}", exc_info=True)
-        return None
\ No newline at end of file
+        return None
+
+def stream_article_content(topic_query: str, previous_articles: list = None):
+    """Generate an article with the streaming API.
+
+    Yields ("title" | "summary" | "content", text) pairs as the model writes
+    each field, then a final ("article", content) pair with the parsed
+    article, or ("error", message) if generation failed.
+    """
+    if client is None:
+        logger.error("GEMINI_API_KEY not set and no other LLM_BACKEND configured")
+        raise Exception("GEMINI_API_KEY not set")
+
+    article_logger.info(f"Starting streamed article generation for topic: {topic_query}")
+    prompt = build_article_prompt(topic_query, previous_articles)
+    parser = ArticleStreamParser()
+    all_citations = set()
+
+    if not gemini_breaker.allow():
+        count_gemini_failure("circuit_open")
+        logger.warning(f"Not streaming topic '{topic_query}': Gemini circuit is open")
+        yield "error", "Article generation is temporarily unavailable"
+        return
+
+    try:
+        slot = gemini_limiter.slot(estimate_tokens(prompt), timeout=GEMINI_SLOT_WAIT_SECONDS)
+        with slot as usage, GeminiCallTimer("stream") as call:
+            response = client.models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=prompt,
+                config=generate_content_config
+            )
+            deadline = stream_with_deadline(response, GEMINI_STREAM_CHUNK_SECONDS, GEMINI_CALL_DEADLINE_SECONDS, name="Gemini")
+            with closing(deadline) as chunks:
+                for chunk in chunks:
+                    usage.record_usage(prompt_token_count(chunk))
+                    call.record_usage(chunk)
+                    all_citations |= extract_grounding_citations(chunk)
+                    if chunk.text:
+                        for field, text in parser.feed(chunk.text):
+                            yield field, text
+    except GeneratorExit:
+        # The client went away; that says nothing about Gemini's health
+        gemini_breaker.record_skipped()
+        raise
+    except RateLimitTimeout as e:
+        gemini_breaker.record_skipped()
+        count_gemini_failure(failure_reason(e))
+        logger.warning(f"Not streaming topic '{topic_query}': {e}")
+        yield "error", "Article generation is busy, please try again shortly"
+        return
+    except Exception as e:
+        gemini_breaker.record(e)
+        logger.error(f"Error streaming content for topic '{topic_query}': {e}", exc_info=True)
+        yield "error", "Failed to generate content"
+        return
+    gemini_breaker.record_success()
+
+    content = parse_article_json(parser.text)
+    if content is None:
+        count_gemini_failure("unparseable")
+        yield "error", "Failed to parse generated article"
+        return
+    content = finalize_article(content, all_citations)
+    article_logger.info(f"Successfully streamed article: '{content.get('title')}' for topic: {topic_query}")
+    yield "article", content
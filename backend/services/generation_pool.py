@@ -0,0 +1,23 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging_config import logger
+
+# Gemini calls spend nearly all their time waiting on the network, so a small
+# thread pool lets several articles generate at once.
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "4"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Return the process-wide generation pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            logger.info(f"Starting article generation pool with {GENERATION_WORKERS} workers")
+            _executor = ThreadPoolExecutor(
+                max_workers=GENERATION_WORKERS,
+                thread_name_prefix="article-gen"
+            )
+        return _executor
@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+import time
+import requests
+from google.auth import jwt as google_jwt
+from logging_config import logger
+
+# Google's ID token signing certificates as {key id: x509 PEM}
+GOOGLE_CERTS_URL = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+# Used when the certificate response has no Cache-Control max-age
+DEFAULT_MAX_AGE_SECONDS = 300
+# Refresh in the background once this fraction of max-age has passed
+REFRESH_AT_FRACTION = 0.8
+FETCH_TIMEOUT_SECONDS = 10
+# A token signed by a key we have not cached forces a refetch at most this often
+UNKNOWN_KEY_REFETCH_SECONDS = int(os.getenv("GOOGLE_CERTS_UNKNOWN_KEY_REFETCH_SECONDS", "60"))
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+def parse_max_age(cache_control: str, default: int = DEFAULT_MAX_AGE_SECONDS) -> int:
+    match = _MAX_AGE_RE.search(cache_control or "")
+    return int(match.group(1)) if match else default
+
+class CachedCertsVerifier:
+    """Verifies Google ID tokens against certificates cached for their Cache-Control max-age.
+
+    Certificates are fetched over one pooled HTTP session and refreshed on a
+    background timer before they expire, so logins normally never wait on
+    Google. A request only blocks on a fetch when the cache is cold or the
+    background refresh has failed long enough for the keys to expire.
+
+    A token whose key id is missing from the cache, as happens right after
+    Google rotates its keys, forces one refetch before it is rejected. Such
+    refetches are rate-limited, so forged key ids cannot hammer Google.
+    """
+
+    def __init__(self, certs_url: str = GOOGLE_CERTS_URL, session: requests.Session = None,
+                 clock=time.time, background_refresh: bool = True):
+        self.certs_url = certs_url
+        self.session = session or requests.Session()
+        self.background_refresh = background_refresh
+        self._clock = clock
+        self._certs = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last_forced = None
+        self.fetches = 0
+
+    def _fetch(self):
+        response = self.session.get(self.certs_url, timeout=FETCH_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        certs = response.json()
+        max_age = parse_max_age(response.headers.get("Cache-Control"))
+        self._certs = certs
+        self._expires_at = self._clock() + max_age
+        self.fetches += 1
+        logger.debug(f"Fetched {len(certs)} Google signing certificates, valid for {max_age}s")
+        if self.background_refresh:
+            self._schedule_refresh(max_age * REFRESH_AT_FRACTION)
+        return certs
+
+    def _schedule_refresh(self, delay: float):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._refresh)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh(self):
+        try:
+            with self._lock:
+                self._fetch()
+        except Exception as e:
+            # Keep serving the cached keys; the next request refetches once they expire
+            logger.warning(f"Background refresh of Google certificates failed: {e}")
+
+    def get_certs(self) -> dict:
+        certs = self._certs
+        if certs is not None and self._clock() < self._expires_at:
+            return certs
+        with self._lock:
+            # Another request may have refreshed the keys while we waited
+            if self._certs is not None and self._clock() < self._expires_at:
+                return self._certs
+            return self._fetch()
+
+    def _refetch_for_key(self, key_id: str) -> dict:
+        """Refetch the certificates for a key id we have not seen, unless that was done too recently."""
+        with self._lock:
+            if self._certs is not None and key_id in self._certs:
+                # Another request already fetched the new keys
+                return self._certs
+            now = self._clock()
+            if self._last_forced is not None and now - self._last_forced < UNKNOWN_KEY_REFETCH_SECONDS:
+                return self._certs
+            self._last_forced = now
+            logger.info(f"Token signed with unknown key {key_id}, refetching Google certificates")
+            return self._fetch()
+
+    def verify(self, token: str, audience=None) -> dict:
+        """Return the token's claims, raising ValueError if it is not validly signed by Google."""
+        certs = self.get_certs()
+        key_id = google_jwt.decode_header(token).get("kid")
+        if key_id is not None and key_id not in certs:
+            try:
+                certs = self._refetch_for_key(key_id)
+            except Exception as e:
+                logger.warning(f"Refetching Google certificates for key {key_id} failed: {e}")
+        return google_jwt.decode(token, certs=certs, audience=audience)
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self.session.close()
@@ -0,0 +1,267 @@
+"""Durable queue of article generation jobs stored in the ``generation_jobs`` table.
+
+Jobs survive restarts. A worker claims a job by taking a time-limited lease
+with a compare-and-set UPDATE, so several workers or processes can drain the
+same table. The worker renews the leases of its running jobs as it goes, so
+only a job whose worker dies or stalls is claimed again once its lease expires.
+Failed attempts go back to the queue with exponential backoff until
+``max_attempts`` is reached.
+"""
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, and_, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+import models
+from database import SessionLocal
+from logging_config import logger
+from services.generation_pool import get_executor, GENERATION_WORKERS
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# A running job is handed to another worker if its lease runs out
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "600"))
+# Running jobs' leases are extended this often, well within the lease
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 4)))
+JOB_BACKOFF_BASE_SECONDS = float(os.getenv("JOB_BACKOFF_BASE_SECONDS", "30"))
+JOB_BACKOFF_MAX_SECONDS = float(os.getenv("JOB_BACKOFF_MAX_SECONDS", "1800"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+# Writing a job's result is retried this many times, e.g. while SQLite is locked, before
+# the job is left to run again once its lease expires
+JOB_RESULT_WRITE_ATTEMPTS = int(os.getenv("JOB_RESULT_WRITE_ATTEMPTS", "5"))
+JOB_RESULT_RETRY_SECONDS = float(os.getenv("JOB_RESULT_RETRY_SECONDS", "0.5"))
+# Finished jobs are kept this long for inspection, then pruned
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+# Set to wake the worker loop as soon as new jobs are enqueued
+jobs_available = threading.Event()
+
+def enqueue(db: Session, query: str, targets: list, canonical_key: str = None) -> models.GenerationJob:
+    """Add a generation job to the session; it is queued once the caller commits."""
+    job = models.GenerationJob(
+        id=str(uuid.uuid4()),
+        query=query,
+        canonical_key=canonical_key,
+        targets=targets,
+        state=QUEUED,
+        attempts=0,
+        max_attempts=JOB_MAX_ATTEMPTS,
+        next_run_at=datetime.utcnow(),
+    )
+    db.add(job)
+    return job
+
+def _claimable(now: datetime):
+    job = models.GenerationJob
+    return or_(
+        and_(job.state == QUEUED, job.next_run_at <= now),
+        and_(job.state == RUNNING, job.lease_expires_at < now),
+    )
+
+def claim(db: Session, worker_id: str, limit: int, exclude=()) -> list:
+    """Lease up to ``limit`` due jobs to ``worker_id`` and return them as dicts.
+
+    Jobs in ``exclude``, the ones this worker is still running, are never
+    claimed again even if their lease has lapsed.
+    """
+    job = models.GenerationJob
+    now = datetime.utcnow()
+    query = select(job.id).where(_claimable(now))
+    if exclude:
+        query = query.where(job.id.notin_(list(exclude)))
+    candidates = db.execute(query.order_by(job.next_run_at).limit(limit)).scalars().all()
+
+    claimed = []
+    for job_id in candidates:
+        # Only one worker's UPDATE can match while the job is still claimable
+        result = db.execute(
+            update(job).where(job.id == job_id, _claimable(now)).values(
+                state=RUNNING,
+                lease_owner=worker_id,
+                lease_expires_at=now + timedelta(seconds=JOB_LEASE_SECONDS),
+                attempts=job.attempts + 1,
+            )
+        )
+        if result.rowcount == 1:
+            claimed.append(job_id)
+    db.commit()
+
+    if not claimed:
+        return []
+    rows = db.execute(
+        select(job.id, job.query, job.canonical_key, job.targets, job.attempts, job.max_attempts)
+        .where(job.id.in_(claimed))
+    ).all()
+    return [dict(row._mapping) for row in rows]
+
+def renew_leases(db: Session, worker_id: str, job_ids: list) -> int:
+    """Extend the leases ``worker_id`` still holds on ``job_ids``; returns how many it still holds."""
+    if not job_ids:
+        return 0
+    job = models.GenerationJob
+    result = db.execute(
+        update(job).where(job.id.in_(job_ids), job.state == RUNNING, job.lease_owner == worker_id).values(
+            lease_expires_at=datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff, jittered between half and all of the step, after ``attempts`` failures."""
+    ceiling = min(JOB_BACKOFF_MAX_SECONDS, JOB_BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return random.uniform(ceiling / 2, ceiling)
+
+def complete(db: Session, job_id: str, worker_id: str, article_ids: list):
+    job = models.GenerationJob
+    db.execute(
+        update(job).where(job.id == job_id, job.lease_owner == worker_id).values(
+            state=DONE, lease_owner=None, lease_expires_at=None, article_ids=article_ids, last_error=None
+        )
+    )
+    db.commit()
+
+def fail(db: Session, job_id: str, worker_id: str, error: str):
+    """Requeue a failed job with backoff, or mark it failed once it is out of attempts."""
+    job = models.GenerationJob
+    row = db.execute(select(job.attempts, job.max_attempts).where(job.id == job_id)).first()
+    if row is None:
+        return
+    attempts, max_attempts = row
+    if attempts >= max_attempts:
+        values = {"state": FAILED}
+        logger.error(f"Generation job {job_id} failed permanently after {attempts} attempts: {error}")
+    else:
+        delay = backoff_seconds(attempts)
+        values = {"state": QUEUED, "next_run_at": datetime.utcnow() + timedelta(seconds=delay)}
+        logger.warning(f"Generation job {job_id} attempt {attempts} failed, retrying in {delay:.0f}s: {error}")
+    db.execute(
+        update(job).where(job.id == job_id, job.lease_owner == worker_id).values(
+            lease_owner=None, lease_expires_at=None, last_error=error[:2000], **values
+        )
+    )
+    db.commit()
+
+def pending_target_counts(db: Session) -> Counter:
+    """Count {(user_id, topic_id): n} articles already promised by queued or running jobs."""
+    job = models.GenerationJob
+    counts = Counter()
+    for targets in db.execute(select(job.targets).where(job.state.in_([QUEUED, RUNNING]))).scalars():
+        for target in targets or []:
+            counts[(target.get("user_id"), target.get("id"))] += 1
+    return counts
+
+def queue_depth(db: Session) -> dict:
+    job = models.GenerationJob
+    rows = db.execute(select(job.state, func.count(job.id)).group_by(job.state)).all()
+    return {state: count for state, count in rows}
+
+def prune_finished(db: Session, older_than_hours: int = None) -> int:
+    job = models.GenerationJob
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours or JOB_RETENTION_HOURS)
+    result = db.execute(delete(job).where(job.state.in_([DONE, FAILED]), job.updated_at < cutoff))
+    db.commit()
+    return result.rowcount
+
+def record_result(future, job: dict, worker_id: str) -> bool:
+    """Mark a finished job done or failed, retrying the write with backoff.
+
+    Returns False if every attempt failed; the job then stays running until
+    its lease expires and is generated again.
+    """
+    for attempt in range(1, JOB_RESULT_WRITE_ATTEMPTS + 1):
+        db = SessionLocal()
+        try:
+            try:
+                article_ids = future.result()
+            except Exception as e:
+                fail(db, job["id"], worker_id, str(e) or type(e).__name__)
+            else:
+                complete(db, job["id"], worker_id, article_ids)
+            return True
+        except Exception as e:
+            db.rollback()
+            if attempt == JOB_RESULT_WRITE_ATTEMPTS:
+                logger.error(f"Giving up recording result of generation job {job['id']}: {e}", exc_info=True)
+                return False
+            delay = JOB_RESULT_RETRY_SECONDS * (2 ** (attempt - 1))
+            logger.warning(f"Error recording result of generation job {job['id']}, retrying in {delay:.1f}s: {e}")
+            time.sleep(delay)
+        finally:
+            db.close()
+    return False
+
+def run_worker_loop(handle_job, stop_event: threading.Event = None, concurrency: int = None):
+    """Claim jobs and run ``handle_job(job)`` on the generation pool until ``stop_event`` is set.
+
+    ``handle_job`` returns the ids of the saved articles, or raises to have the
+    job retried.
+    """
+    stop_event = stop_event or threading.Event()
+    concurrency = concurrency or GENERATION_WORKERS
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    executor = get_executor()
+    in_flight = {}
+    last_prune = datetime.min
+    last_heartbeat = datetime.utcnow()
+    logger.info(f"Generation worker {worker_id} started with {concurrency} slots")
+
+    while not stop_event.is_set():
+        # Clear before claiming so a job enqueued from here on wakes the next wait
+        jobs_available.clear()
+        capacity = concurrency - len(in_flight)
+        if capacity > 0:
+            db = SessionLocal()
+            try:
+                running = {job["id"] for job in in_flight.values()}
+                for job in claim(db, worker_id, capacity, exclude=running):
+                    logger.info(f"Running generation job {job['id']} (attempt {job['attempts']}) for topic: {job['query']}")
+                    in_flight[executor.submit(handle_job, job)] = job
+                if datetime.utcnow() - last_prune > timedelta(hours=1):
+                    pruned = prune_finished(db)
+                    if pruned:
+                        logger.info(f"Pruned {pruned} finished generation jobs")
+                    last_prune = datetime.utcnow()
+            except Exception as e:
+                logger.error(f"Error claiming generation jobs: {e}", exc_info=True)
+                db.rollback()
+            finally:
+                db.close()
+
+        if not in_flight:
+            jobs_available.wait(JOB_POLL_SECONDS)
+            continue
+
+        if datetime.utcnow() - last_heartbeat > timedelta(seconds=JOB_HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                running = [job["id"] for job in in_flight.values()]
+                held = renew_leases(db, worker_id, running)
+                if held < len(running):
+                    logger.warning(f"Generation worker {worker_id} lost the lease on {len(running) - held} running jobs")
+                last_heartbeat = datetime.utcnow()
+            except Exception as e:
+                logger.error(f"Error renewing generation job leases: {e}", exc_info=True)
+                db.rollback()
+            finally:
+                db.close()
+
+        done, _ = wait(list(in_flight), timeout=JOB_POLL_SECONDS, return_when=FIRST_COMPLETED)
+        for future in done:
+            record_result(future, in_flight.pop(future), worker_id)
+
+def start_worker(handle_job) -> threading.Thread:
+    thread = threading.Thread(target=run_worker_loop, args=(handle_job,), name="generation-worker", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,137 @@
+"""Pull a JSON object out of a model response that is not clean JSON.
+
+Models wrap their JSON in Markdown fences or surround it with prose. They
+also emit trailing commas, raw newlines inside strings and unescaped quotes.
+``extract_json_object`` first tries a strict parse of the whole text, then of
+the span from the first ``{`` to the last ``}``. Only if both fail does it make
+one pass over the text: it finds the outermost object, repairs those problems
+as it copies the text, and parses the result. orjson is used when it is
+installed.
+"""
+import json
+import re
+
+try:
+    import orjson
+
+    def loads(text: str):
+        return orjson.loads(text)
+except ImportError:
+    orjson = None
+    loads = json.loads
+
+# Characters the repair pass needs to look at; everything else is copied in bulk
+_SPECIAL = re.compile(r'[{}\[\]",\\\x00-\x1f]')
+_WHITESPACE = re.compile(r'\s*')
+_CONTROL_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+# After a string really ends, the next non-blank character is one of these
+_STRING_FOLLOWERS = set(':}]"')
+_AFTER_COMMA = set('"{[}]')
+
+def _first_object(value):
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, list) and value and isinstance(value[0], dict):
+        return value[0]
+    return None
+
+def _closes_string(text: str, i: int) -> bool:
+    """Guess whether the quote at ``text[i]`` ends the string or belongs inside it."""
+    j = _WHITESPACE.match(text, i + 1).end()
+    if j >= len(text):
+        return True
+    if text[j] == ',':
+        # A real separator is followed by the next key or value, or a closing bracket
+        k = _WHITESPACE.match(text, j + 1).end()
+        return k >= len(text) or text[k] in _AFTER_COMMA
+    return text[j] in _STRING_FOLLOWERS
+
+def repair_object(text: str, start: int):
+    """Copy the object opening at ``text[start]`` with repairs applied.
+
+    Returns (repaired_text, end_index), or (None, None) if the object is
+    never closed (for example, truncated output).
+    """
+    out = []
+    last = start
+    depth = 0
+    in_string = False
+    skip_to = -1
+    last_comma = None
+    for m in _SPECIAL.finditer(text, start):
+        i = m.start()
+        if i < skip_to:
+            continue
+        c = text[i]
+        if in_string:
+            if c == '\\':
+                skip_to = i + 2
+            elif c == '"':
+                if _closes_string(text, i):
+                    in_string = False
+                else:
+                    # A quote inside the value that the model forgot to escape
+                    out.append(text[last:i])
+                    out.append('\\"')
+                    last = i + 1
+            else:
+                out.append(text[last:i])
+                out.append(_CONTROL_ESCAPES.get(c) or '\\u%04x' % ord(c))
+                last = i + 1
+            continue
+
+        if c == '"':
+            in_string = True
+            last_comma = None
+        elif c == ',':
+            last_comma = i
+        elif c in '}]':
+            if last_comma is not None and not text[last_comma + 1:i].strip():
+                # Trailing comma before a closing bracket
+                out.append(text[last:last_comma])
+                last = last_comma + 1
+            last_comma = None
+            depth -= 1
+            if depth == 0:
+                out.append(text[last:i + 1])
+                return "".join(out), i + 1
+        elif c in '{[':
+            depth += 1
+            last_comma = None
+    return None, None
+
+def extract_json_object(text: str):
+    """Return the first JSON object in ``text`` (repaired if needed), or None."""
+    if not text:
+        return None
+    try:
+        value = _first_object(loads(text))
+        if value is not None:
+            return value
+    except ValueError:
+        pass
+
+    start = text.find('{')
+    if start == -1:
+        return None
+    # Fences or prose around otherwise valid JSON: one slice and a strict parse
+    try:
+        value = _first_object(loads(text[start:text.rindex('}') + 1]))
+        if value is not None:
+            return value
+    except ValueError:
+        pass
+
+    while start != -1:
+        repaired, end = repair_object(text, start)
+        if repaired is None:
+            return None
+        try:
+            value = _first_object(loads(repaired))
+            if value is not None:
+                return value
+        except ValueError:
+            pass
+        # Not a valid object; look for another one after it
+        start = text.find('{', end)
+    return None
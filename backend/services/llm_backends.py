@@ -0,0 +1,170 @@
+"""Model clients that article generation can run against.
+
+A backend is any object with a ``models`` attribute that provides the part of
+the ``google.genai`` client that gemini_service uses:
+
+- ``generate_content(model, contents, config)`` returns a response with
+  ``text``, ``candidates`` and ``usage_metadata``;
+- ``generate_content_stream(model, contents, config)`` yields chunks of the
+  same shape.
+
+``LLM_BACKEND`` chooses the backend: ``gemini`` (the default) or
+``synthetic``. The synthetic backend runs offline. It writes valid article
+JSON after a sampled delay and fails at configured rates, so the service can
+be load-tested without spending quota.
+"""
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from google import genai
+from google.genai import errors
+from logging_config import logger
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+
+# "<distribution>:<params>", e.g. "lognormal:2.0,0.5" (median, sigma),
+# "uniform:0.5,3", "exponential:2.0" (mean) or "fixed:1.5"
+SYNTHETIC_LATENCY = os.getenv("SYNTHETIC_LATENCY", "lognormal:2.0,0.5")
+SYNTHETIC_SERVER_ERROR_RATE = float(os.getenv("SYNTHETIC_SERVER_ERROR_RATE", "0"))
+SYNTHETIC_RATE_LIMIT_RATE = float(os.getenv("SYNTHETIC_RATE_LIMIT_RATE", "0"))
+# Share of responses wrapped in prose and fences with a trailing comma
+SYNTHETIC_MALFORMED_RATE = float(os.getenv("SYNTHETIC_MALFORMED_RATE", "0"))
+SYNTHETIC_ARTICLE_WORDS = int(os.getenv("SYNTHETIC_ARTICLE_WORDS", "400"))
+SYNTHETIC_SEED = os.getenv("SYNTHETIC_SEED")
+
+_TOPIC = re.compile(r'article about: "(.*?)"', re.S)
+_VOCABULARY = (
+    "analysts report growth decline market research data study survey model policy energy "
+    "battery network cloud security privacy regulation funding startup chip supply demand "
+    "quarter annual forecast risk trial patient outcome climate emissions grid storage "
+    "adoption latency throughput benchmark dataset agency court ruling vote coalition "
+    "inflation rates currency exports imports tariff infrastructure satellite launch"
+).split()
+
+def parse_latency(spec: str):
+    """Return a function that samples a delay in seconds from ``rng`` for a latency spec."""
+    name, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    name = name.strip().lower()
+    if name == "fixed":
+        return lambda rng: values[0]
+    if name == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if name == "exponential":
+        return lambda rng: rng.expovariate(1 / values[0])
+    if name == "lognormal":
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class _SyntheticModels:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def generate_content(self, model=None, contents=None, config=None):
+        return self._owner.generate(contents or "")
+
+    def generate_content_stream(self, model=None, contents=None, config=None):
+        return self._owner.stream(contents or "")
+
+class SyntheticClient:
+    def __init__(self, latency: str = SYNTHETIC_LATENCY, server_error_rate: float = SYNTHETIC_SERVER_ERROR_RATE,
+                 rate_limit_rate: float = SYNTHETIC_RATE_LIMIT_RATE, malformed_rate: float = SYNTHETIC_MALFORMED_RATE,
+                 words: int = SYNTHETIC_ARTICLE_WORDS, seed=SYNTHETIC_SEED, sleep=time.sleep):
+        self.sample_latency = parse_latency(latency)
+        self.server_error_rate = server_error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.words = words
+        self.rng = random.Random(seed)
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.models = _SyntheticModels(self)
+
+    def _plan(self, prompt: str):
+        """Draw everything random about one call under the lock, so seeded runs are repeatable."""
+        with self._lock:
+            self.calls += 1
+            roll = self.rng.random()
+            if roll < self.rate_limit_rate:
+                outcome = "rate_limited"
+            elif roll < self.rate_limit_rate + self.server_error_rate:
+                outcome = "server_error"
+            else:
+                outcome = "ok"
+            delay = max(0.0, self.sample_latency(self.rng))
+            text = self._article_text(prompt, malformed=self.rng.random() < self.malformed_rate)
+        return outcome, delay, text
+
+    def _article_text(self, prompt: str, malformed: bool) -> str:
+        match = _TOPIC.search(prompt)
+        topic = match.group(1) if match else "the topic"
+        paragraphs = []
+        remaining = self.words
+        while remaining > 0:
+            n = min(remaining, self.rng.randint(40, 80))
+            paragraphs.append(" ".join(self.rng.choice(_VOCABULARY) for _ in range(n)).capitalize() + ".")
+            remaining -= n
+        content = "\n\n".join(f"## Section {i + 1}\n\n{p}" for i, p in enumerate(paragraphs))
+        report = self.rng.randrange(1_000_000)
+        fields = [
+            ("title", f"Synthetic report {report} on {topic}"),
+            ("summary", f"A generated stand-in article about {topic}. It exists for load testing."),
+            ("content", content),
+            ("source_url", "https://example.com/synthetic"),
+            ("published_date", time.strftime("%Y-%m-%d")),
+        ]
+        body = ",\n".join(f"  {json.dumps(k)}: {json.dumps(v)}" for k, v in fields)
+        citations = '  "citations": ["https://example.com/a", "https://example.com/b"]'
+        if malformed:
+            return f"Here is the article:\n```json\n{{\n{body},\n{citations},\n}}\n```"
+        return f"{{\n{body},\n{citations}\n}}"
+
+    @staticmethod
+    def _response(text: str, prompt: str):
+        return SimpleNamespace(
+            text=text,
+            candidates=[],
+            usage_metadata=SimpleNamespace(prompt_token_count=max(1, len(prompt) // 4), candidates_token_count=len(text) // 4),
+        )
+
+    @staticmethod
+    def _raise(outcome: str):
+        if outcome == "rate_limited":
+            raise errors.ClientError(429, {"error": {"code": 429, "message": "Synthetic quota exceeded", "status": "RESOURCE_EXHAUSTED"}})
+        if outcome == "server_error":
+            raise errors.ServerError(503, {"error": {"code": 503, "message": "Synthetic outage", "status": "UNAVAILABLE"}})
+
+    def generate(self, prompt: str):
+        outcome, delay, text = self._plan(prompt)
+        self._sleep(delay)
+        self._raise(outcome)
+        return self._response(text, prompt)
+
+    def stream(self, prompt: str, chunk_chars: int = 200):
+        outcome, delay, text = self._plan(prompt)
+        # Roughly a third of the time goes to the first token, the rest is spread over the chunks
+        self._sleep(delay / 3)
+        self._raise(outcome)
+        chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        for i, chunk in enumerate(chunks):
+            self._sleep(delay * 2 / 3 / len(chunks))
+            response = self._response(chunk, prompt)
+            if i < len(chunks) - 1:
+                response.usage_metadata = None
+            yield response
+
+def create_client(api_key: str = None, backend: str = LLM_BACKEND):
+    """Return the model client for ``backend``, or None if it is not configured."""
+    if backend == "synthetic":
+        logger.warning(f"Using the synthetic LLM backend (latency {SYNTHETIC_LATENCY}); no real articles will be generated")
+        return SyntheticClient()
+    if backend == "gemini":
+        return genai.Client(api_key=api_key) if api_key else None
+    raise ValueError(f"Unknown LLM_BACKEND: {backend}")
@@ -0,0 +1,292 @@
+"""Prometheus metrics for the API, the database and article generation.
+
+``GET /metrics`` serves everything in the default registry. The request path
+stays cheap:
+
+- ``MetricsMiddleware`` is plain ASGI. It times each request and labels it
+  with the route template, e.g. ``/articles/{article_id}/swipe``, so the
+  series count stays bounded.
+- Database queries are timed by two cursor-execute event hooks on every
+  ``Engine``. The sync and async engines are both covered.
+- Generation job counts are queried when Prometheus scrapes, not per request.
+- The Gemini rate limiter's state (concurrency limit, calls in flight,
+  cooldown, bucket levels) is read from its snapshot at scrape time.
+- Caches and single-flight runners registered with ``watch_cache`` and
+  ``watch_single_flight`` are read from their ``stats()`` at scrape time.
+- Buffer depths are a snapshot taken by the refill planner on each pass. They
+  are exported as a distribution, never per user, so no user ids are published.
+
+Set ``METRICS_ENABLED=0`` to leave the middleware and query hooks out. The
+endpoint requires ``Authorization: Bearer $METRICS_TOKEN`` when a token is
+set, and otherwise only answers clients on the loopback interface.
+"""
+import hmac
+import os
+import threading
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeHistogramMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from database import SessionLocal
+from logging_config import logger
+from services.job_queue import queue_depth
+from services.rate_limiter import RateLimitTimeout, gemini_limiter
+from services.resilience import CircuitOpenError, DeadlineExceeded
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}
+# Upper bounds of the buffer depth distribution, in articles per reader
+BUFFER_DEPTH_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Database statement latency; _count is the number of statements",
+    ["operation"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1, 5),
+)
+GEMINI_LATENCY = Histogram(
+    "gemini_call_duration_seconds", "Model call latency, streams until their last chunk",
+    ["mode", "outcome"],
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 180, 300),
+)
+GEMINI_FAILURES = Counter("gemini_failures_total", "Failed model calls by reason", ["reason"])
+GEMINI_TOKENS = Counter("gemini_tokens_total", "Tokens reported by the model API", ["kind"])
+CLEANUP_LATENCY = Histogram(
+    "retention_cleanup_duration_seconds", "Duration of one retention cleanup pass",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300),
+)
+CLEANUP_WORDS = Counter("retention_words_removed_total", "Words deleted by retention cleanup")
+
+# Label children are bound up front and looked up by the statement's first
+# six characters, so a query only pays for one slice, a dict lookup and observe()
+_QUERY_CHILDREN = {
+    key: DB_QUERY_LATENCY.labels(operation)
+    for operation in ("select", "insert", "update", "delete", "pragma")
+    for key in (operation, operation.upper())
+}
+_OTHER_QUERIES = DB_QUERY_LATENCY.labels("other")
+# (method, route, status) -> histogram child; bounded by the app's routes
+_REQUEST_CHILDREN = {}
+
+def failure_reason(error: Exception) -> str:
+    if isinstance(error, CircuitOpenError):
+        return "circuit_open"
+    if isinstance(error, RateLimitTimeout):
+        return "throttled"
+    if isinstance(error, (DeadlineExceeded, TimeoutError)):
+        return "deadline"
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code == 429:
+        return "rate_limited"
+    if isinstance(code, int):
+        return "server_error" if code >= 500 else "client_error"
+    return "error"
+
+def count_gemini_failure(reason: str):
+    GEMINI_FAILURES.labels(reason).inc()
+
+class GeminiCallTimer:
+    """Context manager that times one model call and counts its tokens or its failure.
+
+    Pass every response or stream chunk to ``record_usage``. The last usage
+    report seen is counted when the call ends, because streams repeat the
+    running totals on each chunk.
+    """
+    __slots__ = ("mode", "started", "usage")
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.usage = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def record_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self.usage = usage
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            outcome = "ok"
+        elif isinstance(exc, Exception):
+            outcome = "error"
+            count_gemini_failure(failure_reason(exc))
+        else:
+            # GeneratorExit: the client went away mid-stream
+            outcome = "cancelled"
+        GEMINI_LATENCY.labels(self.mode, outcome).observe(time.perf_counter() - self.started)
+        if self.usage is not None:
+            GEMINI_TOKENS.labels("prompt").inc(getattr(self.usage, "prompt_token_count", None) or 0)
+            GEMINI_TOKENS.labels("output").inc(getattr(self.usage, "candidates_token_count", None) or 0)
+        return False
+
+class _Snapshots:
+    """Collector for gauges whose values are read at scrape time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buffer_depths = ()
+        self.caches = {}
+        self.single_flights = {}
+
+    def set_buffer_depths(self, depths):
+        depths = tuple(depths)
+        with self._lock:
+            self._buffer_depths = depths
+
+    @staticmethod
+    def _families(buckets=None, total=None, empty=0):
+        return (
+            GaugeHistogramMetricFamily(
+                "feed_buffer_depth", "Unread plus queued articles per active reader at the last refill plan",
+                buckets=buckets, gsum_value=total,
+            ),
+            GaugeMetricFamily("feed_buffer_empty_readers", "Active readers with nothing buffered at the last refill plan", value=empty),
+            GaugeMetricFamily("generation_jobs", "Generation jobs by state (the refill queue)", labels=["state"]),
+        )
+
+    @staticmethod
+    def _limiter_families(state=None):
+        state = state or {}
+        calls = CounterMetricFamily("gemini_limiter_calls", "Calls released by the Gemini limiter by outcome", labels=["outcome"])
+        tokens = GaugeMetricFamily("gemini_limiter_tokens_available", "Units left in the limiter's token buckets", labels=["bucket"])
+        if state:
+            for outcome, key in (("success", "successes"), ("overload", "overloads"), ("error", "errors"), ("cancelled", "cancelled")):
+                calls.add_metric([outcome], state[key])
+            tokens.add_metric(["requests"], state["request_tokens_available"])
+            tokens.add_metric(["input_tokens"], state["input_tokens_available"])
+        return (
+            GaugeMetricFamily("gemini_limiter_concurrency_limit", "Current AIMD cap on concurrent Gemini calls", value=state.get("concurrency_limit", 0)),
+            GaugeMetricFamily("gemini_limiter_in_flight", "Gemini calls holding a limiter slot", value=state.get("in_flight", 0)),
+            GaugeMetricFamily("gemini_limiter_cooldown_seconds", "Seconds left of the overload cooldown", value=state.get("cooldown_remaining_seconds", 0)),
+            tokens,
+            calls,
+            CounterMetricFamily("gemini_limiter_throttled_seconds", "Time calls spent waiting for a limiter slot", value=state.get("throttled_seconds", 0)),
+        )
+
+    def _stats_families(self, read=True):
+        lookups = CounterMetricFamily("cache_lookups", "Cache lookups by result", labels=["cache", "result"])
+        evictions = CounterMetricFamily("cache_evictions", "Entries evicted to stay within maxsize", labels=["cache"])
+        entries = GaugeMetricFamily("cache_entries", "Entries currently cached", labels=["cache"])
+        triggers = CounterMetricFamily("single_flight_triggers", "Calls to trigger(), including coalesced ones", labels=["name"])
+        runs = CounterMetricFamily("single_flight_runs", "Runs actually started", labels=["name"])
+        running = GaugeMetricFamily("single_flight_running", "1 while a run is in progress", labels=["name"])
+        if read:
+            for name, cache in list(self.caches.items()):
+                stats = cache.stats()
+                lookups.add_metric([name, "hit"], stats["hits"])
+                lookups.add_metric([name, "miss"], stats["misses"])
+                evictions.add_metric([name], stats["evictions"])
+                entries.add_metric([name], stats["size"])
+            for name, flight in list(self.single_flights.items()):
+                stats = flight.stats()
+                triggers.add_metric([name], stats["triggers"])
+                runs.add_metric([name], stats["runs"])
+                running.add_metric([name], 1 if stats["running"] else 0)
+        return (lookups, evictions, entries, triggers, runs, running)
+
+    def describe(self):
+        # Lets the registry learn the names without running collect(), which queries the database
+        return list(self._families()) + list(self._limiter_families()) + list(self._stats_families(read=False))
+
+    def collect(self):
+        yield from self._limiter_families(gemini_limiter.snapshot())
+        yield from self._stats_families()
+
+        with self._lock:
+            depths = self._buffer_depths
+        buckets = [(str(bound), sum(1 for d in depths if d <= bound)) for bound in BUFFER_DEPTH_BUCKETS]
+        buckets.append(("+Inf", len(depths)))
+        buffers, empty, jobs = self._families(buckets, sum(depths), sum(1 for d in depths if d == 0))
+        yield buffers
+        yield empty
+
+        db = SessionLocal()
+        try:
+            for state, count in queue_depth(db).items():
+                jobs.add_metric([state], count)
+        except Exception as e:
+            logger.error(f"Error reading generation queue depth for metrics: {e}")
+        finally:
+            db.close()
+        yield jobs
+
+snapshots = _Snapshots()
+REGISTRY.register(snapshots)
+
+def watch_cache(name: str, cache):
+    """Export a TTLCache's hit, miss, eviction and size counts under ``cache=name``."""
+    snapshots.caches[name] = cache
+
+def watch_single_flight(name: str, flight):
+    """Export a SingleFlight's trigger and run counts under ``name=name``."""
+    snapshots.single_flights[name] = flight
+
+def record_buffer_depths(depths):
+    """Replace the buffer depth snapshot with the buffered article counts of the active readers."""
+    snapshots.set_buffer_depths(depths)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    try:
+        started = context._metrics_started
+    except AttributeError:
+        return
+    _QUERY_CHILDREN.get(statement[:6], _OTHER_QUERIES).observe(time.perf_counter() - started)
+
+def instrument_queries():
+    """Time every statement run by any engine in this process."""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    """Record the latency of every HTTP request, labelled by method, route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = scope.get("route")
+            key = (scope["method"], getattr(route, "path", "unmatched"), status)
+            child = _REQUEST_CHILDREN.get(key)
+            if child is None:
+                child = _REQUEST_CHILDREN[key] = REQUEST_LATENCY.labels(key[0], key[1], str(status))
+            child.observe(elapsed)
+
+def metrics_allowed(authorization: str, client_host: str) -> bool:
+    """Whether a scrape may read /metrics: the bearer token if one is configured, else loopback only."""
+    if METRICS_TOKEN:
+        return hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}")
+    return client_host in LOOPBACK_HOSTS
+
+def render_metrics():
+    """Return (body, content_type) for the /metrics endpoint."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,198 @@
+"""Client-side rate limiting for Gemini calls.
+
+Two token buckets keep us under the project's requests-per-minute and
+input-tokens-per-minute quotas. An AIMD limiter caps concurrent calls: each
+success raises the cap by about one call per round, and a 429 or 5xx halves it
+and pauses new calls for a growing cooldown.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging_config import logger
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_MIN_CONCURRENCY = int(os.getenv("GEMINI_MIN_CONCURRENCY", "1"))
+# Pause after the first overload response; doubles with each consecutive one
+OVERLOAD_COOLDOWN_SECONDS = float(os.getenv("GEMINI_OVERLOAD_COOLDOWN_SECONDS", "5"))
+OVERLOAD_COOLDOWN_MAX_SECONDS = float(os.getenv("GEMINI_OVERLOAD_COOLDOWN_MAX_SECONDS", "300"))
+# Longest a call waits for a slot before giving up; keep it well under JOB_LEASE_SECONDS
+GEMINI_SLOT_WAIT_SECONDS = float(os.getenv("GEMINI_SLOT_WAIT_SECONDS", "240"))
+
+class RateLimitTimeout(TimeoutError):
+    pass
+
+def is_overload_error(error: Exception) -> bool:
+    """True for quota (429) and server-side (5xx) API errors."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English prose
+    return max(1, len(text) // 4)
+
+class TokenBucket:
+    """Refills ``rate_per_minute`` units per minute, up to one minute's worth."""
+
+    def __init__(self, rate_per_minute: float, clock=time.monotonic):
+        self.capacity = rate_per_minute
+        self.rate_per_second = rate_per_minute / 60.0
+        self._clock = clock
+        self.tokens = rate_per_minute
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available (0 if they are now)."""
+        self._refill()
+        # A single oversized request is allowed once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_second
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def adjust(self, amount: float):
+        """Correct an earlier estimate once the real usage is known; may leave the bucket in debt."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class GeminiRateLimiter:
+    def __init__(self, rpm: float = GEMINI_RPM, tpm: float = GEMINI_TPM,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY, min_concurrency: int = GEMINI_MIN_CONCURRENCY,
+                 clock=time.monotonic):
+        self.requests = TokenBucket(rpm, clock)
+        self.tokens = TokenBucket(tpm, clock)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self._clock = clock
+        self._cooldown_until = 0.0
+        self._consecutive_overloads = 0
+        self._cond = threading.Condition()
+        self.successes = 0
+        self.overloads = 0
+        self.errors = 0
+        self.cancelled = 0
+        self.throttled_seconds = 0.0
+
+    def acquire(self, estimated_tokens: int, timeout: float = None) -> bool:
+        """Block until a call of ``estimated_tokens`` input tokens may start.
+
+        Returns False if that takes longer than ``timeout`` seconds (None waits indefinitely).
+        """
+        started = self._clock()
+        with self._cond:
+            while True:
+                now = self._clock()
+                wait = max(
+                    self._cooldown_until - now,
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(estimated_tokens),
+                )
+                if wait <= 0 and self.in_flight < int(self.concurrency_limit):
+                    self.requests.take(1)
+                    self.tokens.take(estimated_tokens)
+                    self.in_flight += 1
+                    break
+                if timeout is not None:
+                    remaining = started + timeout - now
+                    if remaining <= 0:
+                        self.throttled_seconds += now - started
+                        return False
+                    wait = min(wait, remaining) if wait > 0 else remaining
+                # Woken early when a slot frees up; otherwise re-check once the wait elapses
+                self._cond.wait(timeout=wait if wait > 0 else None)
+            self.throttled_seconds += self._clock() - started
+        return True
+
+    def release(self, error: Exception = None, actual_tokens: int = None, estimated_tokens: int = 0, counted: bool = True):
+        """Free a slot. With ``counted=False`` the call says nothing about Gemini's health and leaves the AIMD state alone."""
+        with self._cond:
+            self.in_flight -= 1
+            if actual_tokens is not None:
+                self.tokens.adjust(actual_tokens - estimated_tokens)
+            if not counted:
+                self.cancelled += 1
+            elif error is None:
+                self.successes += 1
+                self._consecutive_overloads = 0
+                # Additive increase: about +1 once every slot has succeeded
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+            elif is_overload_error(error):
+                self.overloads += 1
+                self._consecutive_overloads += 1
+                # Multiplicative decrease plus a cooldown before anyone tries again
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+                cooldown = min(OVERLOAD_COOLDOWN_MAX_SECONDS,
+                               OVERLOAD_COOLDOWN_SECONDS * (2 ** (self._consecutive_overloads - 1)))
+                self._cooldown_until = max(self._cooldown_until, self._clock() + cooldown)
+                logger.warning(
+                    f"Gemini overloaded ({getattr(error, 'code', '?')}): concurrency limit now "
+                    f"{self.concurrency_limit:.1f}, pausing {cooldown:.0f}s"
+                )
+            else:
+                self.errors += 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, estimated_tokens: int, timeout: float = None):
+        """Hold a rate-limited slot for one call. Call ``record_usage`` on the yielded object if the real token count is known.
+
+        Raises ``RateLimitTimeout`` if no slot frees up within ``timeout`` seconds.
+        Leaving the block with GeneratorExit or another non-Exception (a cancelled
+        attempt, an abandoned stream) releases the slot without counting the call.
+        """
+        if not self.acquire(estimated_tokens, timeout):
+            raise RateLimitTimeout(f"no Gemini slot within {timeout:.0f}s")
+        usage = _Usage()
+        error = None
+        counted = True
+        try:
+            yield usage
+        except Exception as e:
+            error = e
+            raise
+        except BaseException:
+            counted = False
+            raise
+        finally:
+            self.release(error, usage.tokens, estimated_tokens, counted)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            now = self._clock()
+            self.requests._refill()
+            self.tokens._refill()
+            return {
+                "concurrency_limit": round(self.concurrency_limit, 2),
+                "in_flight": self.in_flight,
+                "request_tokens_available": round(self.requests.tokens, 2),
+                "input_tokens_available": round(self.tokens.tokens, 2),
+                "cooldown_remaining_seconds": round(max(0.0, self._cooldown_until - now), 2),
+                "successes": self.successes,
+                "overloads": self.overloads,
+                "errors": self.errors,
+                "cancelled": self.cancelled,
+                "throttled_seconds": round(self.throttled_seconds, 2),
+            }
+
+class _Usage:
+    def __init__(self):
+        self.tokens = None
+
+    def record_usage(self, tokens: int):
+        if tokens is not None:
+            self.tokens = tokens
+
+gemini_limiter = GeminiRateLimiter()
@@ -0,0 +1,132 @@
+import heapq
+import os
+import random
+import time
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+import models
+from logging_config import logger
+from services.topics import canonical_key
+from services.job_queue import pending_target_counts
+from services.metrics import record_buffer_depths
+
+# Each active reader should have this many unread cards waiting
+BUFFER_TARGET_PER_USER = int(os.getenv("BUFFER_TARGET_PER_USER", "5"))
+# Readers seen within this window are eligible for refills; idle users are skipped
+ACTIVE_WINDOW_SECONDS = int(os.getenv("ACTIVE_WINDOW_SECONDS", str(24 * 60 * 60)))
+# Upper bound on articles ordered by a single refill pass
+MAX_REFILL_PER_PASS = int(os.getenv("MAX_REFILL_PER_PASS", "10"))
+
+# user_id -> unix time of the last feed read or swipe. Kept in memory so that
+# recording activity never adds a write to the request path.
+_last_active = {}
+
+def record_activity(user_id: str, now: float = None):
+    """Mark a user as actively reading."""
+    _last_active[user_id] = now if now is not None else time.time()
+
+def active_users(now: float = None) -> dict:
+    """Return {user_id: last_active} for users seen within the active window."""
+    now = now if now is not None else time.time()
+    return {
+        user_id: seen for user_id, seen in list(_last_active.items())
+        if now - seen <= ACTIVE_WINDOW_SECONDS
+    }
+
+def buffer_counts(db: Session, user_ids) -> dict:
+    """Return {(user_id, topic_id): unread_count} for the given users."""
+    rows = db.query(
+        models.ArticleCard.user_id,
+        models.ArticleCard.topic_id,
+        func.count(models.ArticleCard.id)
+    ).filter(
+        models.ArticleCard.user_id.in_(user_ids),
+        models.ArticleCard.is_archived == False,
+        models.ArticleCard.is_consumed == False
+    ).group_by(models.ArticleCard.user_id, models.ArticleCard.topic_id).all()
+    return {(user_id, topic_id): count for user_id, topic_id, count in rows}
+
+def plan_refill(db: Session, now: float = None, limit: int = None) -> list:
+    """Decide which topics to generate for next, most urgent reader first.
+
+    Users are ordered by their buffer deficit, counting articles that queued
+    jobs will deliver, and then by how recently they were active. Each pop
+    assigns one article to the user's least-stocked topic and pushes the user
+    back with a smaller deficit, so several hungry readers are served in turn
+    rather than one after another.
+    Returns a list of topic dicts ({"id", "query", "user_id", "canonical_key"}).
+    """
+    limit = limit if limit is not None else MAX_REFILL_PER_PASS
+    active = active_users(now)
+    if not active:
+        logger.debug("No active readers, skipping refill")
+        record_buffer_depths(())
+        return []
+
+    topics_by_user = {}
+    for t in db.query(models.Topic).filter(models.Topic.user_id.in_(active.keys())).all():
+        topics_by_user.setdefault(t.user_id, []).append(
+            {"id": t.id, "query": t.query, "user_id": t.user_id, "canonical_key": t.canonical_key or canonical_key(t.query)}
+        )
+
+    counts = buffer_counts(db, list(topics_by_user.keys())) if topics_by_user else {}
+    # Articles already queued for generation count towards the buffer
+    for key, pending in pending_target_counts(db).items():
+        counts[key] = counts.get(key, 0) + pending
+
+    heap = []
+    per_topic = {}
+    depths = []
+    for user_id, topics in topics_by_user.items():
+        buffered = 0
+        for topic in topics:
+            per_topic[topic["id"]] = counts.get((user_id, topic["id"]), 0)
+            buffered += per_topic[topic["id"]]
+        depths.append(buffered)
+        deficit = BUFFER_TARGET_PER_USER - buffered
+        if deficit > 0:
+            heapq.heappush(heap, (-deficit, -active[user_id], user_id))
+        logger.debug(f"User {user_id} buffer: {buffered}/{BUFFER_TARGET_PER_USER}")
+
+    record_buffer_depths(depths)
+
+    plan = []
+    while heap and len(plan) < limit:
+        neg_deficit, neg_seen, user_id = heapq.heappop(heap)
+        topics = topics_by_user[user_id]
+        fewest = min(per_topic[t["id"]] for t in topics)
+        topic = random.choice([t for t in topics if per_topic[t["id"]] == fewest])
+        per_topic[topic["id"]] += 1
+        plan.append(topic)
+        if neg_deficit + 1 < 0:
+            heapq.heappush(heap, (neg_deficit + 1, neg_seen, user_id))
+
+    if plan:
+        logger.info(f"Refill plan: {len(plan)} articles for {len({t['user_id'] for t in plan})} users")
+    return plan
+
+def group_by_canonical_topic(plan: list) -> list:
+    """Collapse planned slots so each canonical topic is generated once per round.
+
+    Users who follow the same canonical topic share one generation; a user who
+    needs several articles on it gets one from each round. Returns a list of
+    {"query", "canonical_key", "targets"} dicts, where targets are the topic
+    dicts that should each receive a copy of the generated article.
+    """
+    rounds = {}
+    for topic in plan:
+        slots = rounds.setdefault(topic["canonical_key"], [])
+        for targets in slots:
+            if all(t["user_id"] != topic["user_id"] for t in targets):
+                targets.append(topic)
+                break
+        else:
+            slots.append([topic])
+
+    jobs = [
+        {"query": targets[0]["query"].strip(), "canonical_key": key, "targets": targets}
+        for key, slots in rounds.items() for targets in slots
+    ]
+    if len(jobs) < len(plan):
+        logger.info(f"Shared topics: {len(plan)} planned articles need only {len(jobs)} generations")
+    return jobs
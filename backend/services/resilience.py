@@ -0,0 +1,330 @@
+"""Deadlines, hedged requests and a circuit breaker for slow upstream calls.
+
+``ResilientCall`` wraps a blocking function. Each call:
+
+- fails fast with ``CircuitOpenError`` while the breaker is open;
+- raises ``DeadlineExceeded`` if no attempt finishes within the deadline;
+- can optionally start a second, hedged attempt once the first has run past
+  the recent p95 latency. The first attempt to succeed wins.
+
+``stream_with_deadline`` applies the same kind of deadline to a streaming
+response, both between chunks and over the whole stream.
+
+An ``admit`` hook, such as a rate limiter slot, is entered before an attempt
+is sent, so time spent queueing for quota does not count against the
+deadline. An attempt that has not started by the time its call gives up is
+dropped instead of being sent late.
+
+Python threads cannot be cancelled, so an attempt that misses its deadline
+keeps running on its own thread until the underlying client gives up. Give the
+client a transport timeout close to the deadline so those threads are reaped.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from logging_config import logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    pass
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+class AttemptCancelled(BaseException):
+    """Thrown into an admission context when its attempt is dropped before being sent.
+
+    A BaseException, like GeneratorExit, so that admission hooks do not count it as an upstream error.
+    """
+
+def trips_breaker(error: Exception) -> bool:
+    """Client errors (4xx other than 429) say nothing about upstream health; everything else does."""
+    code = getattr(error, "code", None)
+    return not (isinstance(code, int) and 400 <= code < 500 and code != 429)
+
+class LatencyTracker:
+    """Rolling window of recent successful call durations."""
+
+    def __init__(self, window: int = 100):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, pct: float):
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures.
+
+    After ``reset_seconds`` one trial call is let through (half-open). Its
+    success closes the breaker and its failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 60, name: str = "upstream", clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self.rejected = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._clock() - self.opened_at >= self.reset_seconds:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"{self.name} circuit closed")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    logger.warning(
+                        f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures; "
+                        f"failing fast for {self.reset_seconds:.0f}s"
+                    )
+                self.state = OPEN
+                self.opened_at = self._clock()
+                self._trial_in_flight = False
+
+    def record_skipped(self):
+        """An allowed call never reached upstream: free the half-open trial without changing state."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record(self, error: Exception = None):
+        """Record a call's outcome; errors that say nothing about upstream health count as successes."""
+        if error is not None and trips_breaker(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.consecutive_failures, "rejected": self.rejected}
+
+_END = object()
+
+def stream_with_deadline(iterable, chunk_seconds: float, total_seconds: float, name: str = "stream"):
+    """Yield from ``iterable``, raising DeadlineExceeded if it stalls.
+
+    The iterable is read on a helper thread, so a blocked read cannot hold up the
+    caller. The deadline is missed if the next item takes longer than
+    ``chunk_seconds`` or the stream runs past ``total_seconds`` in all. The reader
+    stops at its next item once the caller gives up or closes this generator.
+    """
+    items = queue.Queue()
+    stop = threading.Event()
+
+    def read():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                items.put((item, None))
+            items.put((_END, None))
+        except Exception as e:
+            items.put((_END, e))
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception as e:
+                    logger.debug(f"Error closing abandoned {name} stream: {e}")
+
+    threading.Thread(target=read, name=f"{name}-stream", daemon=True).start()
+    deadline = time.monotonic() + total_seconds
+    try:
+        while True:
+            timeout = min(chunk_seconds, deadline - time.monotonic())
+            try:
+                item, error = items.get(timeout=max(timeout, 0))
+            except queue.Empty:
+                raise DeadlineExceeded(f"{name} stream stalled for {chunk_seconds:.0f}s or ran past {total_seconds:.0f}s") from None
+            if error is not None:
+                raise error
+            if item is _END:
+                return
+            yield item
+    finally:
+        stop.set()
+
+class _Exited:
+    """Exit an already-entered context manager when this block ends."""
+
+    def __init__(self, context):
+        self.context = context
+
+    def __enter__(self):
+        return self.context
+
+    def __exit__(self, exc_type, exc, tb):
+        return self.context.__exit__(exc_type, exc, tb)
+
+class ResilientCall:
+    """Call ``func`` with a deadline, optional hedging and a circuit breaker.
+
+    If ``admit`` is given, it is called as ``admit(timeout, *args, **kwargs)``
+    and must return a context manager that raises if it cannot be entered
+    within ``timeout`` seconds. Each attempt enters one on the caller's thread
+    before being sent: with ``admit_timeout`` for the first attempt, while a
+    hedge is only sent if it is admitted at once. The entered value is passed
+    to ``func`` as its first argument, and the context is exited when the
+    attempt finishes, even after its call has given up on it.
+    """
+
+    def __init__(self, func, deadline_seconds: float, breaker: CircuitBreaker = None,
+                 hedge: bool = False, hedge_percentile: float = 95, hedge_min_samples: int = 20,
+                 max_threads: int = 8, name: str = None, admit=None, admit_timeout: float = None):
+        self.func = func
+        self.admit = admit
+        self.admit_timeout = admit_timeout
+        self.deadline_seconds = deadline_seconds
+        self.name = name or getattr(func, "__name__", "call")
+        self.breaker = breaker or CircuitBreaker(name=self.name)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latency = LatencyTracker()
+        # Separate from the generation pool so stuck attempts cannot starve it
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix=f"{self.name}-call")
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self.dropped = 0
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None if hedging is off or there is too little history."""
+        if not self.hedge or len(self.latency) < self.hedge_min_samples:
+            return None
+        return self.latency.percentile(self.hedge_percentile)
+
+    def _timed(self, admission, given_up, args, kwargs):
+        if admission is None:
+            started = time.monotonic()
+            result = self.func(*args, **kwargs)
+            return result, time.monotonic() - started
+        context, permit = admission
+        if given_up.is_set():
+            # Queued behind stuck threads until after the call gave up: never send it
+            self.dropped += 1
+            context.__exit__(AttemptCancelled, AttemptCancelled(), None)
+            raise AttemptCancelled()
+        with _Exited(context):
+            started = time.monotonic()
+            result = self.func(permit, *args, **kwargs)
+        return result, time.monotonic() - started
+
+    def _admit(self, timeout, args, kwargs):
+        """Enter the admission context for one attempt; None if there is no ``admit`` hook."""
+        if self.admit is None:
+            return None
+        context = self.admit(timeout, *args, **kwargs)
+        return context, context.__enter__()
+
+    def __call__(self, *args, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            admission = self._admit(self.admit_timeout, args, kwargs)
+        except Exception:
+            self.breaker.record_skipped()
+            raise
+        self.calls += 1
+        given_up = threading.Event()
+        try:
+            return self._run(admission, given_up, args, kwargs)
+        finally:
+            given_up.set()
+
+    def _run(self, admission, given_up, args, kwargs):
+        # The deadline covers the attempts themselves, not waiting to be admitted
+        deadline = time.monotonic() + self.deadline_seconds
+        pending = {self._executor.submit(self._timed, admission, given_up, args, kwargs)}
+        primary = next(iter(pending))
+        last_error = None
+
+        hedge_delay = self.hedge_delay()
+        if hedge_delay is not None and hedge_delay < self.deadline_seconds:
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done:
+                try:
+                    hedge_admission = self._admit(0, args, kwargs)
+                except Exception as e:
+                    logger.info(f"{self.name} slower than p{self.hedge_percentile:.0f} but not hedging: {e}")
+                else:
+                    logger.info(f"{self.name} slower than p{self.hedge_percentile:.0f} ({hedge_delay:.1f}s), sending hedged request")
+                    self.hedged += 1
+                    pending.add(self._executor.submit(self._timed, hedge_admission, given_up, args, kwargs))
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result, elapsed = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if future is not primary:
+                    self.hedge_wins += 1
+                self.latency.record(elapsed)
+                self.breaker.record_success()
+                return result
+
+        if pending:
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise DeadlineExceeded(f"{self.name} did not finish within {self.deadline_seconds:.0f}s")
+        self.breaker.record(last_error)
+        raise last_error
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "dropped": self.dropped,
+            "p95_seconds": self.latency.percentile(95),
+            "breaker": self.breaker.stats(),
+        }
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from sqlalchemy import select, delete, or_, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+import models
+from logging_config import logger
+from services.word_ledger import GLOBAL_SCOPE, get_totals, apply_deltas
+from services.feed import remove_from_deck
+
+# Total words kept across all articles before old ones are removed
+WORD_LIMIT = int(os.getenv("WORD_LIMIT", "5000"))
+RETENTION_INTERVAL_SECONDS = int(os.getenv("RETENTION_INTERVAL_SECONDS", "300"))
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "500"))
+
+def select_victims(db: Session, excess: int) -> list:
+    """Pick the oldest consumed/archived articles whose words cover ``excess``.
+
+    Consumed articles go before archived ones. Candidates are read in
+    ``RETENTION_BATCH_SIZE`` keyset pages along ix_articles_retention, and
+    reading stops at the first row that covers the excess, so a pass touches
+    about as many rows as it deletes. Only (id, user_id, words) is read, never
+    the article body.
+    Returns a list of (id, user_id, words) tuples.
+    """
+    article = models.ArticleCard
+    order = (article.is_archived, article.created_at, article.id)
+    query = select(
+        article.id, article.user_id, func.coalesce(article.word_count, 0).label("words"), *order[:2]
+    ).where(
+        or_(article.is_consumed == True, article.is_archived == True),
+        # A NULL in the keyset makes the row comparison NULL and would end paging early;
+        # migrations give undated legacy rows the epoch, so none are expected here
+        article.created_at.isnot(None)
+    ).order_by(*order).limit(RETENTION_BATCH_SIZE)
+
+    victims = []
+    covered = 0
+    after = None
+    while covered < excess:
+        page = query if after is None else query.where(tuple_(*order) > tuple_(*after))
+        rows = db.execute(page).all()
+        for row in rows:
+            victims.append((row.id, row.user_id, row.words))
+            covered += row.words
+            if covered >= excess:
+                break
+        if len(rows) < RETENTION_BATCH_SIZE:
+            break
+        last = rows[-1]
+        after = (last.is_archived, last.created_at, last.id)
+    return victims
+
+def compact(db: Session, word_limit: int = None, batch_size: int = None) -> int:
+    """Delete old articles until the ledger total is within ``word_limit``.
+
+    Victims are removed with bulk DELETE statements, committing every
+    ``batch_size`` rows together with the matching ledger adjustment.
+    Returns the number of words removed.
+    """
+    word_limit = word_limit if word_limit is not None else WORD_LIMIT
+    batch_size = batch_size or RETENTION_BATCH_SIZE
+
+    totals = get_totals(db)
+    total_count = totals.total_words if totals else 0
+    if total_count <= word_limit:
+        logger.debug(f"Total word count {total_count} is within limit")
+        return 0
+
+    excess = total_count - word_limit
+    logger.info(f"Total word count {total_count} exceeds limit. Need to remove {excess} words.")
+
+    victims = select_victims(db, excess)
+    deleted_words = 0
+    for start in range(0, len(victims), batch_size):
+        batch = victims[start:start + batch_size]
+        deltas = {}
+        for _, user_id, words in batch:
+            for scope in (GLOBAL_SCOPE, user_id):
+                if scope is None:
+                    continue
+                current = deltas.setdefault(scope, [0, 0])
+                current[0] -= words
+                current[1] -= words
+        victim_ids = [v[0] for v in batch]
+        remove_from_deck(db, victim_ids)
+        db.execute(
+            delete(models.ArticleCard).where(models.ArticleCard.id.in_(victim_ids)),
+            execution_options={"synchronize_session": False}
+        )
+        # Bulk deletes skip the ORM flush hooks, so adjust the ledger here
+        apply_deltas(db.connection(), deltas)
+        db.commit()
+        deleted_words += sum(v[2] for v in batch)
+
+    logger.info(f"Cleanup complete. Removed {len(victims)} articles ({deleted_words} words).")
+    return deleted_words
+
+def start_retention_loop(run_once, interval: int = None):
+    """Run ``run_once`` every ``interval`` seconds on a daemon thread."""
+    interval = interval or RETENTION_INTERVAL_SECONDS
+
+    def loop():
+        while True:
+            run_once()
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="retention-compactor", daemon=True)
+    thread.start()
+    logger.info(f"Retention compactor scheduled every {interval}s")
+    return thread
@@ -0,0 +1,75 @@
+import threading
+import time
+from logging_config import logger
+
+class SingleFlight:
+    """Run at most one instance of a function at a time, folding overlapping triggers into it.
+
+    A trigger that arrives while a run is in flight does not start its own run.
+    Instead it asks the current run to go round once more when it finishes, so
+    any burst of triggers costs at most one extra pass. The leader waits
+    ``debounce_seconds`` before each pass so that triggers arriving together
+    are absorbed by the same pass.
+    """
+
+    def __init__(self, fn, debounce_seconds: float = 0.0, name: str = None):
+        self.fn = fn
+        self.debounce_seconds = debounce_seconds
+        self.name = name or fn.__name__
+        self._lock = threading.Lock()
+        self._running = False
+        self._rerun = False
+        self.triggers = 0
+        self.runs = 0
+
+    @property
+    def coalesced(self) -> int:
+        """Number of triggers that joined another run instead of starting their own."""
+        return self.triggers - self.runs
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "triggers": self.triggers,
+                "runs": self.runs,
+                "coalesced": self.triggers - self.runs,
+                "running": self._running,
+            }
+
+    def trigger(self) -> bool:
+        """Run the function, or join the run already in flight.
+
+        Returns True if this call led a run and False if it was coalesced.
+        """
+        with self._lock:
+            self.triggers += 1
+            if self._running:
+                self._rerun = True
+                logger.debug(f"{self.name}: run in flight, coalescing trigger")
+                return False
+            self._running = True
+
+        try:
+            while True:
+                if self.debounce_seconds:
+                    time.sleep(self.debounce_seconds)
+                with self._lock:
+                    # Triggers seen up to here are covered by the pass about to start
+                    self._rerun = False
+                    self.runs += 1
+                try:
+                    self.fn()
+                except Exception as e:
+                    logger.error(f"{self.name} failed: {e}", exc_info=True)
+                with self._lock:
+                    if not self._rerun:
+                        self._running = False
+                        logger.info(
+                            f"{self.name} finished: {self.runs} runs for {self.triggers} triggers "
+                            f"({self.triggers - self.runs} coalesced)"
+                        )
+                        return True
+        except BaseException:
+            with self._lock:
+                self._running = False
+            raise
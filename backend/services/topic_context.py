@@ -0,0 +1,62 @@
+"""Recent article digests per canonical topic, for the prompt's "already covered" list.
+
+The newest ``CONTEXT_ARTICLES_PER_TOPIC`` titles and summaries of each topic
+are kept in memory. They are loaded once from the database, which finds a
+topic's articles through ix_articles_topic_created. After that they are
+updated as articles are saved, so building a prompt normally needs no query.
+Entries expire after ``CONTEXT_CACHE_TTL_SECONDS``, which bounds how stale a
+topic can get when another process is also generating for it.
+"""
+import os
+from collections import deque
+from sqlalchemy import select
+from sqlalchemy.sql import func
+import models
+from database import SessionLocal
+from logging_config import logger
+from services.ttl_cache import TTLCache
+
+CONTEXT_ARTICLES_PER_TOPIC = int(os.getenv("CONTEXT_ARTICLES_PER_TOPIC", "5"))
+CONTEXT_CACHE_MAX_TOPICS = int(os.getenv("CONTEXT_CACHE_MAX_TOPICS", "10000"))
+CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", "3600"))
+
+# canonical key -> deque of {"title", "summary"} digests, newest first
+context_cache = TTLCache(CONTEXT_CACHE_MAX_TOPICS, CONTEXT_CACHE_TTL_SECONDS)
+
+def load_recent_digests(key: str, limit: int = CONTEXT_ARTICLES_PER_TOPIC) -> list:
+    """Return the newest distinct article digests across every topic with this canonical key."""
+    article, topic = models.ArticleCard, models.Topic
+    latest = func.max(article.created_at)
+    db = SessionLocal()
+    try:
+        # Subscribers hold copies of the same article, so collapse them by title
+        rows = db.execute(
+            select(article.title, func.max(article.summary))
+            .where(article.topic_id.in_(select(topic.id).where(topic.canonical_key == key)))
+            .group_by(article.title)
+            .order_by(latest.desc())
+            .limit(limit)
+        ).all()
+    finally:
+        db.close()
+    return [{"title": title, "summary": summary} for title, summary in rows]
+
+def recent_digests(key: str) -> list:
+    """Newest-first digests for a canonical topic, loading them on a cache miss."""
+    entries = context_cache.get(key)
+    if entries is None:
+        entries = deque(load_recent_digests(key), maxlen=CONTEXT_ARTICLES_PER_TOPIC)
+        context_cache.set(key, entries)
+        logger.debug(f"Loaded {len(entries)} context articles for topic '{key}'")
+    return list(entries)
+
+def record_article(key: str, content: dict):
+    """Put a newly saved article at the front of its topic's context."""
+    entries = context_cache.get(key)
+    if entries is None:
+        # Not cached: the next read loads it from the database anyway
+        return
+    title = content.get("title")
+    if any(d["title"] == title for d in entries):
+        return
+    entries.appendleft({"title": title, "summary": content.get("summary")})
@@ -0,0 +1,24 @@
+import re
+import unicodedata
+from sqlalchemy import event
+import models
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n\"'`.,;:!?"
+
+def canonical_key(query: str) -> str:
+    """Normalize a topic query so that trivially different spellings share one key.
+
+    "What is happening with Russia and Ukraine now?" and
+    "  what is happening with russia and ukraine now " map to the same key.
+    """
+    text = unicodedata.normalize("NFKC", query or "").casefold()
+    text = _WHITESPACE_RE.sub(" ", text)
+    return text.strip(_EDGE_PUNCTUATION)
+
+def _set_canonical_key(mapper, connection, topic):
+    topic.canonical_key = canonical_key(topic.query)
+
+# Keep the key in step with the query however a topic is written
+event.listen(models.Topic, "before_insert", _set_canonical_key)
+event.listen(models.Topic, "before_update", _set_canonical_key)
@@ -0,0 +1,151 @@
+"""Running word-count totals for the articles table.
+
+Every ORM flush that inserts, deletes or changes an ArticleCard adjusts the
+per-user and global rows of ``word_count_ledger`` in the same transaction, so
+the cleanup limit check is a single primary-key read. Bulk ``DELETE`` or
+``UPDATE`` statements bypass the ORM and must call ``apply_deltas`` themselves.
+
+``reconcile_ledger`` also writes a ``__built__`` marker row. ``ensure_ledger``
+rebuilds whenever the marker is missing, even if flushes have already created
+a partial ``__global__`` row. Rebuild the ledger from the articles table with::
+
+    python -m services.word_ledger
+"""
+from sqlalchemy import event, inspect, update, insert, case, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+import models
+from logging_config import logger
+
+GLOBAL_SCOPE = "__global__"
+# Present once the ledger has been rebuilt from the articles table; holds no words
+BUILT_SCOPE = "__built__"
+
+_PENDING_KEY = "word_ledger_deltas"
+
+def _contribution(word_count, is_consumed, is_archived):
+    words = word_count or 0
+    return words, words if (is_consumed or is_archived) else 0
+
+def _history_value(state, attr, old: bool):
+    history = state.attrs[attr].history
+    if old:
+        values = history.deleted or history.unchanged
+    else:
+        values = history.added or history.unchanged
+    return values[0] if values else None
+
+def _add(deltas: dict, user_id, total: int, reclaimable: int):
+    if not total and not reclaimable:
+        return
+    for scope in (GLOBAL_SCOPE, user_id):
+        if scope is None:
+            continue
+        current = deltas.setdefault(scope, [0, 0])
+        current[0] += total
+        current[1] += reclaimable
+
+def _collect_deltas(session, flush_context, instances):
+    deltas = session.info.setdefault(_PENDING_KEY, {})
+    for obj in session.new:
+        if isinstance(obj, models.ArticleCard):
+            _add(deltas, obj.user_id, *_contribution(obj.word_count, obj.is_consumed, obj.is_archived))
+    for obj in session.deleted:
+        if isinstance(obj, models.ArticleCard):
+            total, reclaimable = _contribution(obj.word_count, obj.is_consumed, obj.is_archived)
+            _add(deltas, obj.user_id, -total, -reclaimable)
+    for obj in session.dirty:
+        if not isinstance(obj, models.ArticleCard) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        old = {attr: _history_value(state, attr, True) for attr in ("user_id", "word_count", "is_consumed", "is_archived")}
+        new = {attr: _history_value(state, attr, False) for attr in old}
+        if old == new:
+            continue
+        old_total, old_reclaimable = _contribution(old["word_count"], old["is_consumed"], old["is_archived"])
+        new_total, new_reclaimable = _contribution(new["word_count"], new["is_consumed"], new["is_archived"])
+        _add(deltas, old["user_id"], -old_total, -old_reclaimable)
+        _add(deltas, new["user_id"], new_total, new_reclaimable)
+
+def apply_deltas(connection, deltas: dict):
+    """Add {scope: (total_delta, reclaimable_delta)} to the ledger rows."""
+    ledger = models.WordCountLedger.__table__
+    for scope, (total, reclaimable) in deltas.items():
+        if not total and not reclaimable:
+            continue
+        increment = update(ledger).where(ledger.c.scope == scope).values(
+            total_words=ledger.c.total_words + total,
+            reclaimable_words=ledger.c.reclaimable_words + reclaimable
+        )
+        if connection.execute(increment).rowcount:
+            continue
+        try:
+            # A savepoint, so losing the race below does not roll back the caller's transaction
+            with connection.begin_nested():
+                connection.execute(insert(ledger).values(scope=scope, total_words=total, reclaimable_words=reclaimable))
+        except IntegrityError:
+            # Another session created the row first; add to it instead
+            connection.execute(increment)
+
+def _write_deltas(session, flush_context):
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+event.listen(Session, "before_flush", _collect_deltas)
+event.listen(Session, "after_flush", _write_deltas)
+
+def get_totals(db: Session, scope: str = GLOBAL_SCOPE):
+    """Return the ledger row for a scope, or None if it has never been written."""
+    return db.get(models.WordCountLedger, scope)
+
+def reconcile_ledger(db: Session):
+    """Rebuild every ledger row from the articles table and mark the ledger as built."""
+    # Delete first: on SQLite this takes the write lock, so no flush can slip in
+    # between summing the articles and writing the totals
+    db.query(models.WordCountLedger).delete()
+    reclaimable = case(
+        (or_(models.ArticleCard.is_consumed == True, models.ArticleCard.is_archived == True),
+         func.coalesce(models.ArticleCard.word_count, 0)),
+        else_=0
+    )
+    rows = db.query(
+        models.ArticleCard.user_id,
+        func.sum(func.coalesce(models.ArticleCard.word_count, 0)),
+        func.sum(reclaimable)
+    ).group_by(models.ArticleCard.user_id).all()
+
+    grand_total = grand_reclaimable = 0
+    for user_id, total, reclaimable_words in rows:
+        total, reclaimable_words = int(total or 0), int(reclaimable_words or 0)
+        grand_total += total
+        grand_reclaimable += reclaimable_words
+        if user_id is not None:
+            db.add(models.WordCountLedger(scope=user_id, total_words=total, reclaimable_words=reclaimable_words))
+    db.add(models.WordCountLedger(scope=GLOBAL_SCOPE, total_words=grand_total, reclaimable_words=grand_reclaimable))
+    db.add(models.WordCountLedger(scope=BUILT_SCOPE, total_words=0, reclaimable_words=0))
+    db.commit()
+    logger.info(f"Word count ledger rebuilt: {grand_total} words across {len(rows)} users")
+
+def ledger_built(db: Session) -> bool:
+    return db.get(models.WordCountLedger, BUILT_SCOPE) is not None
+
+def ensure_ledger(db: Session):
+    """Build the ledger on first run against a database that predates it.
+
+    A ``__global__`` row alone is not enough: flushes that ran before the
+    ledger was built create it holding only their own deltas.
+    """
+    if not ledger_built(db):
+        logger.info("Word count ledger not built yet, rebuilding from articles")
+        reconcile_ledger(db)
+
+if __name__ == "__main__":
+    from database import SessionLocal, engine
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        reconcile_ledger(db)
+    finally:
+        db.close()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""Test near-duplicate detection and the bound on topics held in memory."""
+
+import sys
+sys.path.insert(0, '.')
+
+from services.dedup import NearDuplicateIndex, minhash
+
+STORY = "The city council approved a new budget for public transport on Tuesday after a long debate"
+
+def test_rejects_near_duplicate_in_same_topic():
+    index = NearDuplicateIndex(loader=None)
+    assert index.admit("transit", minhash(STORY), "first") is None
+    label, score = index.admit("transit", minhash(STORY + " evening"), "second")
+    assert label == "first" and score >= index.min_similarity
+    # Other topics are indexed separately
+    assert index.admit("budget", minhash(STORY), "elsewhere") is None
+
+def test_least_recently_checked_topic_is_evicted():
+    loads = []
+    def loader(key, limit):
+        loads.append(key)
+        return []
+    index = NearDuplicateIndex(loader=loader, max_topics=2)
+    for key in ("a", "b", "a", "c"):
+        index.admit(key, minhash(f"{STORY} {key}"), key)
+    assert index.stats()["topics"] == 2
+    # "a" was checked more recently than "b", so "b" made room for "c"
+    index.find("a", minhash(STORY))
+    index.find("b", minhash(STORY))
+    assert loads == ["a", "b", "c", "b"]
+
+def test_topic_is_reloaded_after_ttl():
+    loads = []
+    def loader(key, limit):
+        loads.append(key)
+        return []
+    index = NearDuplicateIndex(loader=loader, ttl=0)
+    index.find("a", minhash(STORY))
+    index.find("a", minhash(STORY))
+    assert loads == ["a", "a"]
+
+if __name__ == "__main__":
+    test_rejects_near_duplicate_in_same_topic()
+    test_least_recently_checked_topic_is_evicted()
+    test_topic_is_reloaded_after_ttl()
+    print("✓ Dedup tests passed")
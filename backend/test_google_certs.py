@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Test the cached Google certificate verifier against a local stand-in certificate endpoint."""
+
+import sys
+sys.path.insert(0, '.')
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt as google_jwt
+
+from services.google_certs import CachedCertsVerifier, parse_max_age
+
+KEY_ID = "test-key"
+
+def make_key_and_cert():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode()
+    cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+    return key_pem, cert_pem
+
+KEY_PEM, CERT_PEM = make_key_and_cert()
+
+class CertHandler(BaseHTTPRequestHandler):
+    max_age = 3600
+    hits = 0
+    certs = {KEY_ID: CERT_PEM}
+
+    def do_GET(self):
+        CertHandler.hits += 1
+        body = json.dumps(CertHandler.certs).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Cache-Control", f"public, max-age={CertHandler.max_age}, must-revalidate")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_cert_server():
+    server = HTTPServer(("127.0.0.1", 0), CertHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/certs"
+
+def make_token(sub="user-1", key_pem=KEY_PEM, key_id=KEY_ID):
+    signer = crypt.RSASigner.from_string(key_pem, key_id=key_id)
+    now = int(time.time())
+    return google_jwt.encode(signer, {
+        "iss": "https://accounts.google.com", "sub": sub, "email": f"{sub}@example.com",
+        "iat": now, "exp": now + 600,
+    }).decode()
+
+def test_parse_max_age():
+    assert parse_max_age("public, max-age=19845, must-revalidate, no-transform") == 19845
+    assert parse_max_age(None, default=7) == 7
+
+def test_certs_are_cached_until_max_age():
+    server, url = start_cert_server()
+    now = [1000.0]
+    CertHandler.hits = 0
+    CertHandler.max_age = 60
+    verifier = CachedCertsVerifier(certs_url=url, clock=lambda: now[0], background_refresh=False)
+    try:
+        for sub in ("a", "b", "c"):
+            assert verifier.verify(make_token(sub))["sub"] == sub
+        assert CertHandler.hits == 1
+
+        now[0] += 61
+        assert verifier.verify(make_token())["sub"] == "user-1"
+        assert CertHandler.hits == 2
+    finally:
+        verifier.close()
+        server.shutdown()
+
+def test_background_refresh_before_expiry():
+    server, url = start_cert_server()
+    CertHandler.hits = 0
+    CertHandler.max_age = 1
+    verifier = CachedCertsVerifier(certs_url=url)
+    try:
+        verifier.get_certs()
+        deadline = time.time() + 5
+        while CertHandler.hits < 2 and time.time() < deadline:
+            time.sleep(0.05)
+        assert CertHandler.hits >= 2
+    finally:
+        verifier.close()
+        server.shutdown()
+
+def test_rejects_token_from_unknown_key():
+    server, url = start_cert_server()
+    CertHandler.max_age = 60
+    verifier = CachedCertsVerifier(certs_url=url, background_refresh=False)
+    other_key, _ = make_key_and_cert()
+    signer = crypt.RSASigner.from_string(other_key, key_id=KEY_ID)
+    now = int(time.time())
+    token = google_jwt.encode(signer, {"iss": "accounts.google.com", "sub": "x", "iat": now, "exp": now + 600}).decode()
+    try:
+        verifier.verify(token)
+        assert False, "token signed by an unknown key was accepted"
+    except ValueError:
+        pass
+    finally:
+        verifier.close()
+        server.shutdown()
+
+def test_refetches_once_for_rotated_key():
+    server, url = start_cert_server()
+    now = [1000.0]
+    CertHandler.hits = 0
+    CertHandler.max_age = 3600
+    verifier = CachedCertsVerifier(certs_url=url, clock=lambda: now[0], background_refresh=False)
+    new_key, new_cert = make_key_and_cert()
+    try:
+        assert verifier.verify(make_token())["sub"] == "user-1"
+        # Google rotates its keys long before the cached set expires
+        CertHandler.certs = {KEY_ID: CERT_PEM, "new-key": new_cert}
+        assert verifier.verify(make_token("a", new_key, "new-key"))["sub"] == "a"
+        assert CertHandler.hits == 2
+
+        # An unknown key id right after that is rejected without another fetch
+        try:
+            verifier.verify(make_token("b", new_key, "forged-key"))
+            assert False, "token with an unknown key id was accepted"
+        except ValueError:
+            pass
+        assert CertHandler.hits == 2
+    finally:
+        CertHandler.certs = {KEY_ID: CERT_PEM}
+        verifier.close()
+        server.shutdown()
+
+if __name__ == "__main__":
+    test_parse_max_age()
+    test_certs_are_cached_until_max_age()
+    test_background_refresh_before_expiry()
+    test_rejects_token_from_unknown_key()
+    test_refetches_once_for_rotated_key()
+    print("✓ Google certificate cache tests passed")
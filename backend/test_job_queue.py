@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Test job leases, retry backoff and result recording in the generation job queue."""
+
+import sys
+sys.path.insert(0, '.')
+
+import os
+import tempfile
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import build_engine
+from services import job_queue
+
+def open_queue(tmp):
+    engine = build_engine(f"sqlite:///{os.path.join(tmp, 'jobs.db')}")
+    models.Base.metadata.create_all(engine)
+    return engine, sessionmaker(bind=engine)
+
+def enqueue_jobs(db, count, targets=None):
+    jobs = [job_queue.enqueue(db, f"topic {i}", targets or []) for i in range(count)]
+    db.commit()
+    return [job.id for job in jobs]
+
+def state_of(db, job_id):
+    db.expire_all()
+    return db.get(models.GenerationJob, job_id)
+
+def test_claim_leases_each_job_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = open_queue(tmp)
+        db = Session()
+        try:
+            ids = enqueue_jobs(db, 3)
+            first = job_queue.claim(db, "w1", 2)
+            assert len(first) == 2 and all(job["attempts"] == 1 for job in first)
+            rest = job_queue.claim(db, "w2", 5)
+            assert [job["id"] for job in rest] == [i for i in ids if i not in {job["id"] for job in first}]
+            assert job_queue.claim(db, "w3", 5) == []
+            assert job_queue.renew_leases(db, "w1", [job["id"] for job in first]) == 2
+            assert job_queue.renew_leases(db, "w2", [job["id"] for job in first]) == 0
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_expired_lease_is_claimed_again_unless_excluded():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = open_queue(tmp)
+        db = Session()
+        try:
+            [job_id] = enqueue_jobs(db, 1)
+            job_queue.claim(db, "w1", 1)
+            db.execute(update(models.GenerationJob).values(lease_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            db.commit()
+            # The worker still running it must not pick it up twice
+            assert job_queue.claim(db, "w1", 1, exclude=[job_id]) == []
+            [job] = job_queue.claim(db, "w2", 1)
+            assert job["attempts"] == 2
+            assert state_of(db, job_id).lease_owner == "w2"
+            # The first worker lost the lease and can no longer finish the job
+            job_queue.complete(db, job_id, "w1", ["a1"])
+            assert state_of(db, job_id).state == job_queue.RUNNING
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_fail_backs_off_until_max_attempts():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = open_queue(tmp)
+        db = Session()
+        try:
+            [job_id] = enqueue_jobs(db, 1)
+            db.execute(update(models.GenerationJob).values(max_attempts=2))
+            db.commit()
+
+            job_queue.claim(db, "w1", 1)
+            before = datetime.utcnow()
+            job_queue.fail(db, job_id, "w1", "boom")
+            job = state_of(db, job_id)
+            assert job.state == job_queue.QUEUED and job.last_error == "boom"
+            delay = (job.next_run_at - before).total_seconds()
+            assert job_queue.JOB_BACKOFF_BASE_SECONDS / 2 - 1 <= delay <= job_queue.JOB_BACKOFF_BASE_SECONDS + 1
+            # Not due yet
+            assert job_queue.claim(db, "w1", 1) == []
+
+            db.execute(update(models.GenerationJob).values(next_run_at=datetime.utcnow()))
+            db.commit()
+            job_queue.claim(db, "w1", 1)
+            job_queue.fail(db, job_id, "w1", "boom again")
+            assert state_of(db, job_id).state == job_queue.FAILED
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_backoff_grows_and_is_capped():
+    base, cap = job_queue.JOB_BACKOFF_BASE_SECONDS, job_queue.JOB_BACKOFF_MAX_SECONDS
+    for attempts in range(1, 12):
+        step = min(cap, base * 2 ** (attempts - 1))
+        assert step / 2 <= job_queue.backoff_seconds(attempts) <= step
+
+def test_pending_target_counts_only_open_jobs():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = open_queue(tmp)
+        db = Session()
+        try:
+            targets = [{"user_id": "u1", "id": "t1"}, {"user_id": "u2", "id": "t1"}]
+            queued, running, done = enqueue_jobs(db, 3, targets)
+            db.execute(update(models.GenerationJob).where(models.GenerationJob.id == running).values(state=job_queue.RUNNING))
+            db.execute(update(models.GenerationJob).where(models.GenerationJob.id == done).values(state=job_queue.DONE))
+            db.commit()
+            assert job_queue.pending_target_counts(db) == {("u1", "t1"): 2, ("u2", "t1"): 2}
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_record_result_retries_locked_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = open_queue(tmp)
+        session_factory, complete, retry_seconds = job_queue.SessionLocal, job_queue.complete, job_queue.JOB_RESULT_RETRY_SECONDS
+        failures = [2]
+
+        def flaky_complete(*args):
+            if failures[0]:
+                failures[0] -= 1
+                raise OperationalError("UPDATE generation_jobs", {}, Exception("database is locked"))
+            complete(*args)
+
+        job_queue.SessionLocal, job_queue.complete, job_queue.JOB_RESULT_RETRY_SECONDS = Session, flaky_complete, 0.01
+        db = Session()
+        try:
+            [job_id] = enqueue_jobs(db, 1)
+            [job] = job_queue.claim(db, "w1", 1)
+            future = Future()
+            future.set_result(["a1"])
+            assert job_queue.record_result(future, job, "w1")
+            finished = state_of(db, job_id)
+            assert finished.state == job_queue.DONE and finished.article_ids == ["a1"]
+        finally:
+            job_queue.SessionLocal, job_queue.complete, job_queue.JOB_RESULT_RETRY_SECONDS = session_factory, complete, retry_seconds
+            db.close()
+            engine.dispose()
+
+if __name__ == "__main__":
+    test_claim_leases_each_job_once()
+    test_expired_lease_is_claimed_again_unless_excluded()
+    test_fail_backs_off_until_max_attempts()
+    test_backoff_grows_and_is_capped()
+    test_pending_target_counts_only_open_jobs()
+    test_record_result_retries_locked_database()
+    print("✓ Job queue tests passed")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Test JSON extraction against the saved model response corpus."""
+
+import sys
+sys.path.insert(0, '.')
+
+import json
+import os
+
+from services.json_extract import extract_json_object
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "corpus", "model_responses.jsonl")
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def test_corpus_recovery_rate():
+    cases = load_corpus()
+    failures = []
+    for case in cases:
+        result = extract_json_object(case["text"])
+        if case["expect"]:
+            ok = isinstance(result, dict) and result.get("title") == case["title"] and result.get("content")
+        else:
+            ok = result is None
+        if not ok:
+            failures.append(case["name"])
+    recoverable = sum(1 for c in cases if c["expect"])
+    print(f"Recovered {recoverable - len(failures)}/{recoverable} recoverable responses")
+    assert not failures, f"Extraction failed for: {failures}"
+
+def test_repairs_preserve_content():
+    clean = {"title": "T", "summary": "S", "content": "Line one\nLine two\twith tab", "citations": ["a", "b"]}
+    broken = (
+        'Here you go:\n```json\n{\n  "title": "T",\n  "summary": "S",\n'
+        '  "content": "Line one\nLine two\twith tab",\n  "citations": ["a", "b",],\n}\n```'
+    )
+    assert extract_json_object(broken) == clean
+
+def test_unescaped_quotes_inside_values():
+    text = '{"title": "The "Holy Grail" of Batteries", "summary": "He said "hi", then left.", "content": "x"}'
+    result = extract_json_object(text)
+    assert result["title"] == 'The "Holy Grail" of Batteries'
+    assert result["summary"] == 'He said "hi", then left.'
+
+def test_skips_braces_in_leading_prose():
+    text = 'Using {tools} I found:\n{"title": "T", "content": "c"} and {"other": 1}'
+    assert extract_json_object(text) == {"title": "T", "content": "c"}
+
+def test_rejects_unrecoverable_text():
+    assert extract_json_object("") is None
+    assert extract_json_object("No JSON here.") is None
+    assert extract_json_object('{"title": "cut off mid') is None
+    assert extract_json_object("[1, 2, 3]") is None
+
+if __name__ == "__main__":
+    test_corpus_recovery_rate()
+    test_repairs_preserve_content()
+    test_unescaped_quotes_inside_values()
+    test_skips_braces_in_leading_prose()
+    test_rejects_unrecoverable_text()
+    print("✓ JSON extraction tests passed")
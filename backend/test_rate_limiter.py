@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Test the Gemini rate limiter's token buckets, AIMD concurrency and overload cooldown on a fake clock."""
+
+import sys
+sys.path.insert(0, '.')
+
+from services.rate_limiter import GeminiRateLimiter, TokenBucket, OVERLOAD_COOLDOWN_SECONDS
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} error")
+        self.code = code
+
+def make_limiter(clock, rpm=6000, tpm=1_000_000, max_concurrency=4):
+    return GeminiRateLimiter(rpm=rpm, tpm=tpm, max_concurrency=max_concurrency, min_concurrency=1, clock=clock)
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == 1.0
+    clock.advance(0.5)
+    assert bucket.wait_time(1) == 0.5
+    clock.advance(600)
+    assert bucket.wait_time(60) == 0.0
+    bucket._refill()
+    assert bucket.tokens == 60
+    # One request bigger than the bucket may go once it is full
+    assert bucket.wait_time(500) == 0.0
+
+def test_requests_per_minute():
+    clock = FakeClock()
+    limiter = make_limiter(clock, rpm=2)
+    for _ in range(2):
+        assert limiter.acquire(1, timeout=0)
+        limiter.release()
+    assert not limiter.acquire(1, timeout=0)
+    clock.advance(30)
+    assert limiter.acquire(1, timeout=0)
+
+def test_input_tokens_are_charged_and_corrected():
+    clock = FakeClock()
+    limiter = make_limiter(clock, tpm=600)
+    assert limiter.acquire(400, timeout=0)
+    assert not limiter.acquire(400, timeout=0)
+    # The call used far less than estimated; the difference goes back in the bucket
+    limiter.release(actual_tokens=100, estimated_tokens=400)
+    assert limiter.acquire(400, timeout=0)
+    # This one used more, which leaves the bucket in debt until it refills
+    limiter.release(actual_tokens=800, estimated_tokens=400)
+    assert limiter.snapshot()["input_tokens_available"] == -300
+    assert not limiter.acquire(1, timeout=0)
+    clock.advance(31)
+    assert limiter.acquire(1, timeout=0)
+
+def test_aimd_increase_and_decrease():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    overload = FakeAPIError(429)
+    for expected in (2, 1, 1):
+        assert limiter.acquire(1, timeout=0)
+        limiter.release(overload)
+        assert limiter.concurrency_limit == expected
+        clock.advance(3600)
+
+    # Client errors and cancelled calls leave the limit alone
+    assert limiter.acquire(1, timeout=0)
+    limiter.release(FakeAPIError(400))
+    assert limiter.acquire(1, timeout=0)
+    limiter.release(counted=False)
+    assert limiter.concurrency_limit == 1
+
+    # Each success adds 1/limit, so about one slot per round of successes
+    for expected in (2, 2.5):
+        assert limiter.acquire(1, timeout=0)
+        limiter.release()
+        assert limiter.concurrency_limit == expected
+    for _ in range(20):
+        assert limiter.acquire(1, timeout=0)
+        limiter.release()
+    assert limiter.concurrency_limit == 4 and limiter.in_flight == 0
+
+def test_concurrency_limit_caps_in_flight_calls():
+    clock = FakeClock()
+    limiter = make_limiter(clock, max_concurrency=2)
+    assert limiter.acquire(1, timeout=0) and limiter.acquire(1, timeout=0)
+    assert not limiter.acquire(1, timeout=0)
+    limiter.release()
+    assert limiter.acquire(1, timeout=0)
+
+def test_cooldown_after_overload_grows_and_resets():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    assert limiter.acquire(1, timeout=0)
+    limiter.release(FakeAPIError(429))
+    assert not limiter.acquire(1, timeout=0)
+    clock.advance(OVERLOAD_COOLDOWN_SECONDS)
+    assert limiter.acquire(1, timeout=0)
+
+    # A second overload in a row doubles the pause
+    limiter.release(FakeAPIError(503))
+    assert limiter.snapshot()["cooldown_remaining_seconds"] == 2 * OVERLOAD_COOLDOWN_SECONDS
+    clock.advance(2 * OVERLOAD_COOLDOWN_SECONDS)
+
+    # A success resets it to the base pause
+    assert limiter.acquire(1, timeout=0)
+    limiter.release()
+    assert limiter.acquire(1, timeout=0)
+    limiter.release(FakeAPIError(429))
+    assert limiter.snapshot()["cooldown_remaining_seconds"] == OVERLOAD_COOLDOWN_SECONDS
+
+if __name__ == "__main__":
+    test_bucket_refills_at_its_rate_up_to_capacity()
+    test_requests_per_minute()
+    test_input_tokens_are_charged_and_corrected()
+    test_aimd_increase_and_decrease()
+    test_concurrency_limit_caps_in_flight_calls()
+    test_cooldown_after_overload_grows_and_resets()
+    print("✓ Rate limiter tests passed")
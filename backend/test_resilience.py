@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Test deadlines, hedging and the circuit breaker against a fake Gemini client with injected latency."""
+
+import sys
+sys.path.insert(0, '.')
+
+import json
+import threading
+import time
+
+from services import gemini_service
+from services.rate_limiter import GeminiRateLimiter, RateLimitTimeout
+from services.resilience import ResilientCall, CircuitBreaker, CircuitOpenError, DeadlineExceeded, OPEN, CLOSED, HALF_OPEN, stream_with_deadline
+
+ARTICLE = json.dumps({"title": "Fake", "summary": "s", "content": "c", "citations": []})
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} error")
+        self.code = code
+
+class FakeResponse:
+    text = ARTICLE
+    candidates = []
+    usage_metadata = None
+
+class FakeModels:
+    def __init__(self, script):
+        # Each entry is a delay in seconds or an exception to raise
+        self.script = list(script)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model=None, contents=None, config=None):
+        with self._lock:
+            step = self.script[min(self.calls, len(self.script) - 1)]
+            self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        time.sleep(step)
+        return FakeResponse()
+
+    def generate_content_stream(self, model=None, contents=None, config=None):
+        # Each step yields one chunk of the article after its delay
+        for i in range(len(self.script)):
+            with self._lock:
+                self.calls += 1
+            time.sleep(self.script[i])
+            chunk = FakeResponse()
+            chunk.text = ARTICLE if i == 0 else ""
+            yield chunk
+
+class FakeClient:
+    def __init__(self, script):
+        self.models = FakeModels(script)
+
+def call_fake(client):
+    return lambda prompt: client.models.generate_content(contents=prompt)
+
+def test_deadline_abandons_slow_call():
+    client = FakeClient([2.0])
+    call = ResilientCall(call_fake(client), deadline_seconds=0.2, name="fake")
+    started = time.monotonic()
+    try:
+        call("prompt")
+        assert False, "slow call did not hit its deadline"
+    except DeadlineExceeded:
+        pass
+    assert time.monotonic() - started < 1.0
+    assert call.timeouts == 1
+
+def test_hedged_request_beats_slow_primary():
+    client = FakeClient([0.01] * 20 + [2.0, 0.01])
+    call = ResilientCall(call_fake(client), deadline_seconds=5, hedge=True, hedge_min_samples=20, name="fake")
+    for _ in range(20):
+        call("prompt")
+    assert call.hedge_delay() is not None
+
+    started = time.monotonic()
+    assert call("prompt").text == ARTICLE
+    assert time.monotonic() - started < 1.0, "hedge did not cut the tail"
+    assert call.hedged == 1 and call.hedge_wins == 1
+
+def test_hedging_waits_for_history():
+    client = FakeClient([0.3])
+    call = ResilientCall(call_fake(client), deadline_seconds=5, hedge=True, hedge_min_samples=20, name="fake")
+    call("prompt")
+    assert call.hedged == 0 and client.models.calls == 1
+
+def test_circuit_opens_and_recovers():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30, name="fake", clock=lambda: now[0])
+    client = FakeClient([FakeAPIError(503)] * 3 + [0.01])
+    call = ResilientCall(call_fake(client), deadline_seconds=5, breaker=breaker, name="fake")
+
+    for _ in range(3):
+        try:
+            call("prompt")
+            assert False, "upstream error was swallowed"
+        except FakeAPIError:
+            pass
+    assert breaker.state == OPEN
+
+    try:
+        call("prompt")
+        assert False, "open circuit let a call through"
+    except CircuitOpenError:
+        pass
+    assert client.models.calls == 3, "open circuit should not reach the client"
+
+    now[0] += 31
+    call("prompt")
+    assert breaker.state == CLOSED
+
+def test_client_errors_do_not_trip_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, name="fake")
+    client = FakeClient([FakeAPIError(400)])
+    call = ResilientCall(call_fake(client), deadline_seconds=5, breaker=breaker, name="fake")
+    for _ in range(3):
+        try:
+            call("prompt")
+        except FakeAPIError:
+            pass
+    assert breaker.state == CLOSED
+
+def test_limiter_wait_does_not_count_against_deadline():
+    limiter = GeminiRateLimiter(max_concurrency=1)
+    limiter._cooldown_until = time.monotonic() + 0.6
+    client = FakeClient([0.01])
+    call = ResilientCall(
+        lambda usage, prompt: client.models.generate_content(contents=prompt), deadline_seconds=0.3,
+        admit=lambda timeout, prompt: limiter.slot(1, timeout), name="fake"
+    )
+    assert call("prompt").text == ARTICLE
+    assert call.breaker.state == CLOSED and call.timeouts == 0
+
+def test_admission_timeout_skips_the_call():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, name="fake", clock=lambda: now[0])
+    breaker.record_failure()
+    now[0] += 31
+    limiter = GeminiRateLimiter(max_concurrency=1)
+    limiter.acquire(1)
+    client = FakeClient([0.01])
+    call = ResilientCall(
+        lambda usage, prompt: client.models.generate_content(contents=prompt), deadline_seconds=5, breaker=breaker,
+        admit=lambda timeout, prompt: limiter.slot(1, timeout), admit_timeout=0.05, name="fake"
+    )
+    try:
+        call("prompt")
+        assert False, "call ran without a limiter slot"
+    except RateLimitTimeout:
+        pass
+    assert client.models.calls == 0
+    # The half-open trial was handed back, so the next call may still probe upstream
+    limiter.release()
+    call("prompt")
+    assert breaker.state == CLOSED
+
+def test_stalled_stream_hits_its_deadline():
+    def chunks():
+        yield 1
+        time.sleep(2.0)
+        yield 2
+    started = time.monotonic()
+    received = []
+    try:
+        for chunk in stream_with_deadline(chunks(), chunk_seconds=0.2, total_seconds=5):
+            received.append(chunk)
+        assert False, "stalled stream did not hit its deadline"
+    except DeadlineExceeded:
+        pass
+    assert received == [1] and time.monotonic() - started < 1.0
+
+def test_abandoned_stream_is_not_counted():
+    now = [0.0]
+    original = (gemini_service.client, gemini_service.gemini_breaker, gemini_service.gemini_limiter)
+    try:
+        gemini_service.client = FakeClient([0.01, 0.01])
+        gemini_service.gemini_breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, name="fake", clock=lambda: now[0])
+        gemini_service.gemini_limiter = GeminiRateLimiter()
+        gemini_service.gemini_breaker.record_failure()
+        now[0] += 31
+
+        stream = gemini_service.stream_article_content("fake topic")
+        assert next(stream)[0] == "title"
+        stream.close()
+        assert gemini_service.gemini_breaker.state == HALF_OPEN
+        assert gemini_service.gemini_limiter.successes == 0 and gemini_service.gemini_limiter.in_flight == 0
+
+        # The half-open trial was handed back, and a finished stream closes the breaker
+        events = list(gemini_service.stream_article_content("fake topic"))
+        assert events[-1][0] == "article"
+        assert gemini_service.gemini_breaker.state == CLOSED
+    finally:
+        gemini_service.client, gemini_service.gemini_breaker, gemini_service.gemini_limiter = original
+
+def test_generate_article_content_with_fake_client():
+    original = (gemini_service.GEMINI_API_KEY, gemini_service.client, gemini_service.resilient_call_model)
+    try:
+        gemini_service.GEMINI_API_KEY = "test"
+        gemini_service.client = FakeClient([0.01, 2.0])
+        gemini_service.resilient_call_model = ResilientCall(
+            gemini_service.call_model, deadline_seconds=0.2, admit=gemini_service.admit_model_call,
+            breaker=CircuitBreaker(failure_threshold=1, reset_seconds=60, name="fake"), name="fake"
+        )
+
+        article = gemini_service.generate_article_content("fake topic")
+        assert article["title"] == "Fake"
+
+        # Slow call: gives up at the deadline and opens the one-failure breaker
+        started = time.monotonic()
+        assert gemini_service.generate_article_content("fake topic") is None
+        assert time.monotonic() - started < 1.0
+
+        # Open circuit: fails fast without touching the client
+        calls = gemini_service.client.models.calls
+        assert gemini_service.generate_article_content("fake topic") is None
+        assert gemini_service.client.models.calls == calls
+    finally:
+        gemini_service.GEMINI_API_KEY, gemini_service.client, gemini_service.resilient_call_model = original
+
+if __name__ == "__main__":
+    test_deadline_abandons_slow_call()
+    test_hedged_request_beats_slow_primary()
+    test_hedging_waits_for_history()
+    test_circuit_opens_and_recovers()
+    test_client_errors_do_not_trip_breaker()
+    test_limiter_wait_does_not_count_against_deadline()
+    test_admission_timeout_skips_the_call()
+    test_stalled_stream_hits_its_deadline()
+    test_abandoned_stream_is_not_counted()
+    test_generate_article_content_with_fake_client()
+    print("✓ Resilience tests passed")
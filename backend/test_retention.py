@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Test which articles the retention compactor deletes and what it updates afterwards."""
+
+import sys
+sys.path.insert(0, '.')
+
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import build_engine
+from migrations import run_migrations
+from services import retention
+from services.feed import add_to_deck
+from services.word_ledger import GLOBAL_SCOPE, get_totals, reconcile_ledger
+
+START = datetime(2024, 1, 1)
+
+def open_database(tmp):
+    engine = build_engine(f"sqlite:///{os.path.join(tmp, 'retention.db')}")
+    models.Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add_all([models.User(id="u1", email="u1@x"), models.User(id="u2", email="u2@x")])
+    db.commit()
+    return engine, db
+
+def add_article(db, article_id, age_days, consumed=False, archived=False, words=100, user_id="u1"):
+    article = models.ArticleCard(
+        id=article_id, user_id=user_id, title=article_id, content="x", word_count=words,
+        is_consumed=consumed, is_archived=archived, created_at=START - timedelta(days=age_days)
+    )
+    db.add(article)
+    add_to_deck(db, article)
+
+def remaining_ids(db):
+    return {row[0] for row in db.query(models.ArticleCard.id).all()}
+
+def test_deletes_oldest_consumed_then_archived_and_never_unread():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = open_database(tmp)
+        try:
+            add_article(db, "unread-oldest", 50)
+            add_article(db, "archived-old", 40, archived=True)
+            add_article(db, "archived-new", 5, archived=True)
+            add_article(db, "consumed-old", 30, consumed=True)
+            add_article(db, "consumed-new", 10, consumed=True)
+            db.commit()
+            reconcile_ledger(db)
+
+            # 500 words stored, 250 allowed: three victims are needed
+            assert retention.compact(db, word_limit=250) == 300
+            assert remaining_ids(db) == {"unread-oldest", "archived-new"}
+
+            # Nothing reclaimable covers the rest, and unread articles are never taken
+            retention.compact(db, word_limit=0)
+            assert remaining_ids(db) == {"unread-oldest"}
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_ledger_and_deck_follow_deleted_batches():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = open_database(tmp)
+        try:
+            for i in range(7):
+                add_article(db, f"c{i}", 20 - i, consumed=True, words=10 * (i + 1), user_id="u1" if i % 2 else "u2")
+            add_article(db, "keep", 30, user_id="u2")
+            db.commit()
+            reconcile_ledger(db)
+
+            retention.compact(db, word_limit=150, batch_size=2)
+            db.expire_all()
+            articles = models.ArticleCard
+            assert get_totals(db).total_words == db.query(func.sum(articles.word_count)).scalar()
+            for user_id in ("u1", "u2"):
+                stored = db.query(func.sum(articles.word_count)).filter(articles.user_id == user_id).scalar() or 0
+                assert get_totals(db, user_id).total_words == stored, user_id
+            deck_ids = {row[0] for row in db.query(models.FeedDeckEntry.article_id).all()}
+            assert deck_ids == remaining_ids(db)
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_keyset_pages_include_undated_articles():
+    batch_size = retention.RETENTION_BATCH_SIZE
+    retention.RETENTION_BATCH_SIZE = 2
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, db = open_database(tmp)
+        try:
+            for i in range(5):
+                add_article(db, f"dated{i}", 10 - i, consumed=True)
+            db.commit()
+            with engine.begin() as conn:
+                conn.execute(insert(models.ArticleCard.__table__).values(
+                    id="undated", user_id="u1", title="undated", word_count=100, is_consumed=True, is_archived=False, created_at=None
+                ))
+            run_migrations(engine)
+            reconcile_ledger(db)
+
+            victims = retention.select_victims(db, 600)
+            assert [v[0] for v in victims] == ["undated"] + [f"dated{i}" for i in range(5)]
+        finally:
+            retention.RETENTION_BATCH_SIZE = batch_size
+            db.close()
+            engine.dispose()
+
+if __name__ == "__main__":
+    test_deletes_oldest_consumed_then_archived_and_never_unread()
+    test_ledger_and_deck_follow_deleted_batches()
+    test_keyset_pages_include_undated_articles()
+    print("✓ Retention tests passed")
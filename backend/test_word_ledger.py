@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Test that the word count ledger matches the articles table after startup."""
+
+import sys
+sys.path.insert(0, '.')
+
+import os
+import tempfile
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import sessionmaker
+
+import main
+import models
+from database import build_engine
+from services.word_ledger import GLOBAL_SCOPE, apply_deltas, get_totals, ensure_ledger
+
+def make_legacy_database(path):
+    """An articles table written before the ledger existed, some rows missing word_count."""
+    engine = build_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    articles = models.ArticleCard.__table__
+    with engine.begin() as conn:
+        conn.execute(insert(models.User.__table__), [{"id": "u1", "email": "u1@x"}, {"id": "u2", "email": "u2@x"}])
+        rows = []
+        for i in range(40):
+            content = " ".join(["word"] * (10 + i))
+            rows.append({
+                "id": f"a{i}", "user_id": "u1" if i % 2 else "u2", "title": "t", "content": content,
+                # A third of the rows predate the word_count column
+                "word_count": None if i % 3 == 0 else len(content.split()),
+                "is_consumed": i % 4 == 0, "is_archived": False,
+            })
+        conn.execute(insert(articles), rows)
+    return engine
+
+def expected_totals(db):
+    articles = models.ArticleCard
+    totals = dict(db.query(articles.user_id, func.sum(articles.word_count)).group_by(articles.user_id).all())
+    totals[GLOBAL_SCOPE] = db.query(func.sum(articles.word_count)).scalar()
+    return totals
+
+def run_startup(engine):
+    session_factory, main_engine = main.SessionLocal, main.engine
+    main.SessionLocal, main.engine = sessionmaker(autocommit=False, autoflush=False, bind=engine), engine
+    try:
+        main.prepare_database()
+    finally:
+        main.SessionLocal, main.engine = session_factory, main_engine
+
+def test_startup_builds_ledger_for_legacy_database():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_legacy_database(os.path.join(tmp, "legacy.db"))
+        run_startup(engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            assert db.query(models.ArticleCard).filter(models.ArticleCard.word_count == None).count() == 0
+            assert db.query(models.ArticleCard).filter(models.ArticleCard.minhash == None).count() == 0
+            for scope, total in expected_totals(db).items():
+                assert get_totals(db, scope).total_words == total, scope
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_partial_global_row_is_rebuilt():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_legacy_database(os.path.join(tmp, "partial.db"))
+        db = sessionmaker(bind=engine)()
+        try:
+            # What an older startup left behind: flushes wrote their own deltas only
+            db.add(models.WordCountLedger(scope=GLOBAL_SCOPE, total_words=7, reclaimable_words=0))
+            db.commit()
+            ensure_ledger(db)
+            assert get_totals(db).total_words == db.query(func.sum(models.ArticleCard.word_count)).scalar()
+        finally:
+            db.close()
+            engine.dispose()
+
+class RacingConnection:
+    """Lets another writer create the ledger row between apply_deltas' UPDATE and INSERT."""
+    def __init__(self, conn):
+        self.conn = conn
+        self.raced = False
+
+    def execute(self, statement, *args, **kwargs):
+        result = self.conn.execute(statement, *args, **kwargs)
+        if not self.raced and statement.is_dml and statement.table is models.WordCountLedger.__table__:
+            self.raced = True
+            self.conn.execute(insert(models.WordCountLedger.__table__).values(scope="u1", total_words=100, reclaimable_words=5))
+        return result
+
+    def begin_nested(self):
+        return self.conn.begin_nested()
+
+def test_concurrent_insert_of_same_scope():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_legacy_database(os.path.join(tmp, "race.db"))
+        with engine.begin() as conn:
+            conn.execute(update(models.ArticleCard.__table__).where(models.ArticleCard.id == "a1").values(title="kept"))
+            apply_deltas(RacingConnection(conn), {"u1": [10, 1]})
+        db = sessionmaker(bind=engine)()
+        try:
+            row = get_totals(db, "u1")
+            assert (row.total_words, row.reclaimable_words) == (110, 6)
+            # The rest of the caller's transaction survived the failed insert
+            assert db.get(models.ArticleCard, "a1").title == "kept"
+        finally:
+            db.close()
+            engine.dispose()
+
+if __name__ == "__main__":
+    test_startup_builds_ledger_for_legacy_database()
+    test_partial_global_row_is_rebuilt()
+    test_concurrent_insert_of_same_scope()
+    print("✓ Word ledger tests passed")